@@ -0,0 +1,87 @@
+import difflib
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+
+def normalize_name(name):
+    return str(name).strip().lower()
+
+
+class AuthorIndex:
+    # Built once per frame: normalized author name -> Author_IDs and row positions, and Author_ID
+    # -> row positions. A name picks the people who go by it, and then every row of those
+    # Author_IDs (also the rows under an older display name), so include/exclude lookups never
+    # rescan or lowercase the Author column. Misspelled names get prefix/fuzzy suggestions
+    def __init__(self, df):
+        self.length = len(df)
+        self.snapshot = df.attrs.get('snapshot')  # which pull of the data this index belongs to
+        authors = df['Author']
+        known = authors.notna().to_numpy()
+        normalized = authors[known].astype(str).str.strip().str.lower().to_numpy()
+        positions = np.flatnonzero(known)
+        author_ids = df['Author_ID'].to_numpy(dtype='float64', na_value=np.nan)[known]
+        groups = pd.Series(positions).groupby(normalized, sort=False).indices
+        self.rows = {name: positions[rows] for name, rows in groups.items()}
+        self.ids = {name: {int(i) for i in author_ids[rows] if not np.isnan(i)} for name, rows in groups.items()}
+        self.display = {name: authors.iat[positions[rows[0]]] for name, rows in groups.items()}
+        self.sorted_names = sorted(self.rows)
+        every_id = df['Author_ID'].to_numpy(dtype='float64', na_value=np.nan)
+        with_id = np.flatnonzero(~np.isnan(every_id))
+        id_groups = pd.Series(with_id).groupby(every_id[with_id], sort=False).indices
+        self.id_rows = {int(author_id): with_id[rows] for author_id, rows in id_groups.items()}
+
+    def matches(self, df):
+        # True when df is the frame this index was built from (same pull, same rows)
+        return self.snapshot is not None and self.snapshot == df.attrs.get('snapshot') and self.length == len(df)
+
+    def __contains__(self, name):
+        return normalize_name(name) in self.rows
+
+    def author_ids(self, names):
+        # set of every Author_ID that goes by one of these names
+        found = set()
+        for name in names:
+            found |= self.ids.get(normalize_name(name), set())
+        return found
+
+    def positions(self, names):
+        # sorted row positions of everyone in names: every row of their Author_IDs, plus the rows
+        # under one of the names that have no Author_ID (unknown names are skipped)
+        found = [self.id_rows[author_id] for author_id in self.author_ids(names)]
+        found += [self.rows[name] for name in map(normalize_name, names) if name in self.rows]
+        if not found:
+            return np.array([], dtype='int64')
+        return np.unique(np.concatenate(found))
+
+    def keep(self, names):
+        # mask of the rows of everybody but the people in names
+        keep = np.ones(self.length, dtype=bool)
+        keep[self.positions(names)] = False
+        return keep
+
+    def select(self, df, names, exclude=False):
+        # df must be the same frame (same row order) the index was built from
+        if exclude:
+            return df[self.keep(names)]
+        return df.iloc[self.positions(names)]
+
+    def prefix_matches(self, prefix, n=5):
+        prefix = normalize_name(prefix)
+        start = bisect_left(self.sorted_names, prefix)
+        matches = []
+        for name in self.sorted_names[start:start + n]:
+            if not name.startswith(prefix):
+                break
+            matches.append(self.display[name])
+        return matches
+
+    def suggest(self, name, n=3):
+        # display names that look like what was typed: same start first, then close spellings
+        name = normalize_name(name)
+        suggestions = self.prefix_matches(name, n)
+        for match in difflib.get_close_matches(name, self.sorted_names, n=n, cutoff=0.75):
+            if self.display[match] not in suggestions:
+                suggestions.append(self.display[match])
+        return suggestions[:n]
@@ -0,0 +1,161 @@
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from circle_api import STATS, request_access_token
+from instrument import METRICS, merge_snapshots, prometheus_text
+from sync import SYNC_INTERVAL, community_key, load_post_state, parse_communities, sync_and_save, tag_snapshot
+from valuation import build_rollup, pull_most_valuable_people, pull_most_valuable_posts
+
+
+# Headless monthly valuation / payout runs, the same ranking and payout split as the app
+# but for many communities at once, one process per community. Never imports Streamlit or
+# matplotlib so it starts fast from cron.
+#
+# communities.csv has one row per community: name,token,email (the headless auth token)
+# usage: python batch.py communities.csv --month last --top 20 --amount 500 --out payouts
+#        python batch.py communities.csv --date 2024-10-01 --posts --format parquet
+#        python batch.py communities.csv --metrics payouts/metrics.prom   (or .json)
+
+MONTHS = {'all': 0, 'this': 1, 'last': 2}
+
+
+def read_communities(path):
+    with open(path, newline='') as file:
+        try:
+            rows = parse_communities(file)
+        except ValueError as e:
+            raise SystemExit(f"{path}: {e}")
+    if not rows:
+        raise SystemExit(f"{path}: no communities")
+    return rows
+
+
+def current_state(access_token, community, sync=True):
+    # the stored posts, topped up from the API when they are older than the app's sync interval
+    state = load_post_state(community)
+    if state is not None:
+        state = tag_snapshot(state, community)
+        if not sync or pd.Timestamp.now(tz='UTC') - state['synced_at'] < SYNC_INTERVAL:
+            return state
+    elif not sync:
+        raise RuntimeError("nothing stored for this community yet, run it once without --no-sync")
+    return sync_and_save(access_token, community, state)
+
+
+def write_frame(df, path, fmt):
+    if fmt == 'parquet':
+        df.to_parquet(path.with_suffix('.parquet'), index=False)
+    else:
+        df.to_csv(path.with_suffix('.csv'), index=False)
+
+
+def run_community(job):
+    # runs in a worker process, returns a summary row (errors are reported, not raised) with the
+    # timings of just this community under 'metrics' (a worker process runs several communities)
+    name, options = job['name'], job['options']
+    METRICS.reset()
+    STATS.reset()
+    start = time.perf_counter()
+    summary = {'community': name, 'people': 0, 'posts': 0, 'paid': 0.0, 'seconds': 0.0, 'error': ''}
+
+    def notify(message):
+        print(f"[{name}] {message}", file=sys.stderr)
+
+    try:
+        access_token = request_access_token(job['token'], job['email'])
+        if access_token == 1:
+            raise RuntimeError("bad token or email")
+        state = current_state(access_token, community_key(job['token']), sync=options['sync'])
+        out = Path(options['out'])
+        valuation = dict(top_number=options['top'], weights=options['weights'], month=options['month'],
+                         specific_date=options['date'], filter_admins=options['filter_admins'],
+                         filter_mods=options['filter_mods'], notify=notify)
+        people = pull_most_valuable_people(build_rollup(state['posts']), amount=options['amount'], **valuation)
+        write_frame(people, out / f"{name}-people", options['format'])
+        summary['people'] = len(people)
+        if 'Rounded_Payment' in people:
+            summary['paid'] = round(float(people['Rounded_Payment'].sum()), 2)
+        if options['posts']:
+            posts = pull_most_valuable_posts(state['posts'], **valuation)
+            write_frame(posts, out / f"{name}-posts", options['format'])
+            summary['posts'] = len(posts)
+    except Exception as e:
+        summary['error'] = f"{type(e).__name__}: {e}"
+    summary['seconds'] = round(time.perf_counter() - start, 2)
+    summary['metrics'] = METRICS.snapshot()
+    return summary
+
+
+def write_metrics(snapshots, path):
+    # the timings of every community added up, as Prometheus text (.prom/.txt) or JSON
+    merged = merge_snapshots(snapshots)
+    path = Path(path)
+    if path.suffix in ('.prom', '.txt'):
+        path.write_text(prometheus_text(merged, prefix='circle_batch'))
+    else:
+        path.write_text(json.dumps(merged, indent=2, sort_keys=True))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Rank the most valuable people (and posts) of many communities "
+                                                 "and split a payout between them.")
+    parser.add_argument('communities', help="CSV file with name,token,email columns")
+    parser.add_argument('--out', default='payouts', help="folder for the output files (default: payouts)")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--month', choices=list(MONTHS), default='last',
+                        help="all time, this month so far or last month (default: last)")
+    parser.add_argument('--date', help="any day (YYYY-MM-DD) of a specific month, overrides --month")
+    parser.add_argument('--top', type=int, default=10, help="how many people/posts to rank (default: 10)")
+    parser.add_argument('--amount', type=float, default=0, help="dollar amount to split between the top people")
+    parser.add_argument('--posts', action='store_true', help="also write the most valuable posts")
+    parser.add_argument('--like', type=float, default=1)
+    parser.add_argument('--comment', type=float, default=2)
+    parser.add_argument('--basic', type=float, default=1, help="text post weight")
+    parser.add_argument('--image', type=float, default=2, help="image post weight")
+    parser.add_argument('--keep-admins', action='store_true', help="don't filter out admins")
+    parser.add_argument('--keep-mods', action='store_true', help="don't filter out moderators")
+    parser.add_argument('--no-sync', action='store_true', help="only use the stored posts, never call the API")
+    parser.add_argument('--workers', type=int, default=4, help="communities processed at the same time")
+    parser.add_argument('--metrics', help="write per phase timings, request counts and frame sizes here "
+                                          "(.prom for Prometheus text, anything else JSON)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    communities = read_communities(args.communities)
+    Path(args.out).mkdir(parents=True, exist_ok=True)
+    options = {
+        'out': args.out,
+        'format': args.format,
+        'month': 3 if args.date else MONTHS[args.month],
+        'date': args.date or '',
+        'top': args.top,
+        'amount': args.amount,
+        'posts': args.posts,
+        'weights': {'like': args.like, 'comment': args.comment, 'basic': args.basic, 'image': args.image},
+        'filter_admins': not args.keep_admins,
+        'filter_mods': not args.keep_mods,
+        'sync': not args.no_sync,
+    }
+    jobs = [{**row, 'options': options} for row in communities]
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(jobs) or 1))) as pool:
+        summaries = list(pool.map(run_community, jobs))
+
+    snapshots = [summary.pop('metrics') for summary in summaries]
+    if args.metrics:
+        write_metrics(snapshots, args.metrics)
+    summary = pd.DataFrame(summaries)
+    write_frame(summary, Path(args.out) / 'summary', 'csv')
+    print(summary.to_string(index=False))
+    return 1 if (summary['error'] != '').any() else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,66 @@
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ingest import build_posts_frame, page_columns, RAW_POST_COLUMNS  # noqa: E402
+from synthetic import synthetic_posts, pages  # noqa: E402
+
+
+# Time and peak memory of building the posts frame from paged records:
+#   concat = the old loop (pd.concat per page and per space, O(n^2))
+#   once   = collect per-page column lists and build the typed frame one time
+# usage: python benchmarks/bench_ingest.py --sizes 10000 100000 1000000
+
+
+def ingest_concat(spaces):
+    master_list = pd.DataFrame(columns=RAW_POST_COLUMNS)
+    for records in spaces.values():
+        df_all = pd.DataFrame()
+        for page in pages(records):
+            df = pd.json_normalize(page)[RAW_POST_COLUMNS]
+            df_all = pd.concat([df_all, df], ignore_index=True)
+        master_list = pd.concat([master_list, df_all], ignore_index=True)
+    return master_list
+
+
+def ingest_once(spaces):
+    return build_posts_frame(page_columns(page) for records in spaces.values() for page in pages(records))
+
+
+def measure(fn, spaces):
+    # timed on its own, tracemalloc slows everything down a lot
+    start = time.perf_counter()
+    df = fn(spaces)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn(spaces)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 2**20, len(df)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--max-concat', type=int, default=100_000,
+                        help="skip the old concat loop above this many posts (it gets very slow)")
+    args = parser.parse_args()
+
+    print(f"{'posts':>10} {'method':>7} {'seconds':>9} {'peak MiB':>9} {'rows':>9}")
+    for n in args.sizes:
+        spaces = synthetic_posts(n)
+        for name, fn in [('concat', ingest_concat), ('once', ingest_once)]:
+            if name == 'concat' and n > args.max_concat:
+                print(f"{n:>10} {name:>7} {'skipped':>9}")
+                continue
+            elapsed, peak, rows = measure(fn, spaces)
+            print(f"{n:>10} {name:>7} {elapsed:>9.2f} {peak:>9.1f} {rows:>9}")
+
+
+if __name__ == '__main__':
+    main()
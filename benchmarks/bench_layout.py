@@ -0,0 +1,77 @@
+import argparse
+import pickle
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ingest import build_frames, page_columns, POST_RENAMES, RAW_POST_COLUMNS  # noqa: E402
+from synthetic import synthetic_posts, pages  # noqa: E402
+
+
+# Memory and st.cache_data cost (it pickles the frame on write and unpickles a copy on
+# every hit) of the two posts frame layouts:
+#   objects = object strings + Author_Roles lists + int64 counts (the old frame)
+#   compact = categoricals/Arrow strings + int32 counts, roles in the authors table
+# usage: python benchmarks/bench_layout.py --sizes 10000 100000 1000000
+
+
+def object_layout(spaces):
+    records = [record for space in spaces.values() for record in space]
+    df = pd.DataFrame({
+        'post_type': [r['post_type'] for r in records],
+        'display_title': [r['display_title'] for r in records],
+        'comment_count': [r['comment_count'] for r in records],
+        'user_likes_count': [r['user_likes_count'] for r in records],
+        'created_at': pd.to_datetime([r['created_at'] for r in records], utc=True),
+        'author.name': [r['author']['name'] for r in records],
+        'space.name': [r['space']['name'] for r in records],
+        'author.roles': [r['author']['roles'] for r in records],
+        'author.id': pd.array([r['author']['id'] for r in records], dtype='Int64'),
+        'id': pd.array([r['id'] for r in records], dtype='Int64'),
+    }, columns=RAW_POST_COLUMNS).rename(columns=POST_RENAMES)
+    return df.astype({'Title': object, 'Author': object, 'Post_Type': object, 'Space_Name': object})
+
+
+def compact_layout(spaces):
+    posts, authors = build_frames(page_columns(page) for records in spaces.values() for page in pages(records))
+    return posts, authors
+
+
+def cache_cost(frames, repeat=5):
+    # bytes pickled, and the best time for one dumps (cache write) and one loads (cache hit)
+    data = pickle.dumps(frames, protocol=pickle.HIGHEST_PROTOCOL)
+    dumps = min(timed(lambda: pickle.dumps(frames, protocol=pickle.HIGHEST_PROTOCOL)) for _ in range(repeat))
+    loads = min(timed(lambda: pickle.loads(data)) for _ in range(repeat))
+    return len(data), dumps, loads
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def memory(frames):
+    return sum(frame.memory_usage(deep=True).sum() for frame in frames)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'posts':>10} {'layout':>8} {'memory MiB':>11} {'pickle MiB':>11} {'dumps s':>8} {'loads s':>8}")
+    for n in args.sizes:
+        spaces = synthetic_posts(n)
+        layouts = [('objects', (object_layout(spaces),)), ('compact', compact_layout(spaces))]
+        for name, frames in layouts:
+            size, dumps, loads = cache_cost(frames)
+            print(f"{n:>10} {name:>8} {memory(frames) / 2**20:>11.1f} {size / 2**20:>11.1f} "
+                  f"{dumps:>8.3f} {loads:>8.3f}")
+
+
+if __name__ == '__main__':
+    main()
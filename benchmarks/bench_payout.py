@@ -0,0 +1,63 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from valuation import allocate_cents  # noqa: E402
+
+
+# Payout split of an amount between n people by their Worth:
+#   loop  = the old float dollars version (floor, then += 0.01 in a Python loop per leftover cent)
+#   cents = valuation.allocate_cents, integer cents + vectorized largest remainder
+# (the property checks of allocate_cents are in tests/test_payout.py)
+# usage: python benchmarks/bench_payout.py --sizes 100 10000 1000000
+
+
+def payout_loop(worth, amount):
+    df = pd.DataFrame({'Worth': worth})
+    df['payment_amount'] = df['Worth'] / df['Worth'].sum() * amount
+    df['Rounded_Payment'] = np.floor(df['payment_amount'] * 100) / 100  # Round down
+    difference = round(amount - df['Rounded_Payment'].sum(), 2)
+    df['fraction'] = df['payment_amount'] - df['Rounded_Payment']
+    df = df.sort_values(by='fraction', ascending=False)
+    for i in range(int(difference * 100)):
+        df.iloc[i, df.columns.get_loc('Rounded_Payment')] += 0.01
+    return df['Rounded_Payment'].sort_index().to_numpy()
+
+
+def payout_cents(worth, amount):
+    return allocate_cents(worth, int(round(amount * 100))) / 100
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 10_000, 1_000_000])
+    parser.add_argument('--amount', type=float, default=123_456.78)
+    parser.add_argument('--max-loop', type=int, default=100_000,
+                        help="skip the old loop above this many people (one iloc per cent gets very slow)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'people':>10} {'method':>7} {'seconds':>9} {'paid':>14} {'off by':>10}")
+    for n in args.sizes:
+        worth = rng.integers(1, 5_000, n).astype(float)
+        for name, fn in [('loop', payout_loop), ('cents', payout_cents)]:
+            if name == 'loop' and n > args.max_loop:
+                print(f"{n:>10} {name:>7} {'skipped':>9}")
+                continue
+            elapsed, paid = timed(fn, worth, args.amount)
+            print(f"{n:>10} {name:>7} {elapsed:>9.4f} {paid.sum():>14.2f} {paid.sum() - args.amount:>10.2g}")
+
+
+if __name__ == '__main__':
+    main()
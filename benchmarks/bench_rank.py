@@ -0,0 +1,71 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from valuation import top_positions  # noqa: E402
+
+
+# Taking the top_number (at most 25) rows out of a big frame:
+#   sort   = the old way, sort_values over every row and then .head(top_number)
+#   select = valuation.top_positions, argpartition + a sort of just the rows at the top,
+#            ties broken on the ID column
+# for post worths (few distinct values, lots of ties) and for people worths summed per Author_ID
+# usage: python benchmarks/bench_rank.py --rows 1000000 --top 5 25
+
+
+def frame(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Post_ID': rng.permutation(n_rows) + 10_000_000,
+        'Author_ID': rng.integers(1, max(10, n_rows // 20), n_rows),
+        'Likes': rng.integers(0, 120, n_rows),
+        'Comments': rng.integers(0, 30, n_rows),
+    })
+
+
+def sort_top(worth, ids, n):
+    ranked = pd.DataFrame({'Worth': worth, 'ID': ids}).sort_values(['Worth', 'ID'], ascending=[False, True])
+    return ranked.index[:n].to_numpy()
+
+
+def select_top(worth, ids, n):
+    return top_positions(worth, n, tiebreak=ids)
+
+
+def timed(fn, *args, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--top', type=int, nargs='+', default=[5, 25])
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'ranking':>8} {'top':>4} {'sort s':>8} {'select s':>9} {'speedup':>8}")
+    for n_rows in args.rows:
+        df = frame(n_rows)
+        post_worth = (df['Likes'] + df['Comments'] * 2).to_numpy()
+        people = pd.Series(post_worth).groupby(df['Author_ID']).sum()
+        cases = [('posts', post_worth, df['Post_ID'].to_numpy()),
+                 ('people', people.to_numpy(), people.index.to_numpy())]
+        for name, worth, ids in cases:
+            for n in args.top:
+                sort_s, expected = timed(sort_top, worth, ids, n)
+                select_s, got = timed(select_top, worth, ids, n)
+                assert np.array_equal(expected, got), f"{name} top {n} differs"
+                print(f"{len(worth):>10} {name:>8} {n:>4} {sort_s:>8.4f} {select_s:>9.4f} {sort_s / select_s:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
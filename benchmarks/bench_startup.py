@@ -0,0 +1,80 @@
+import argparse
+import ast
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+APP = ROOT / 'streamlit_app.py'
+
+
+# Cold start of the app, measured with python -X importtime in a fresh interpreter:
+#   first render = the imports streamlit_app.py runs before its first st.* call that draws
+#                  something (the time before a cold replica can paint anything)
+#   full app     = every import the script does, i.e. what a first rerun with a token pays
+# plus the heaviest top level packages of each and which big dependencies got loaded
+# usage: python benchmarks/bench_startup.py --runs 5 --top 8
+
+HEAVY = ['pandas', 'numpy', 'pyarrow', 'requests', 'matplotlib', 'dateutil']
+DRAWS = {'set_page_config', 'write', 'markdown', 'title', 'header', 'subheader', 'text_input', 'link_button'}
+
+
+def app_imports():
+    # (imports before the first draw, all module level imports) as source lines
+    tree = ast.parse(APP.read_text())
+    before, every = [], []
+    drawn = False
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            every.append(ast.unparse(node))
+            if not drawn:
+                before.append(ast.unparse(node))
+        elif not drawn and draws(node):
+            drawn = True
+    return before, every
+
+
+def draws(node):
+    # a bare string at module level is st.write magic, st.<draw>() or anything assigned from one
+    if isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str):
+        return True
+    for call in ast.walk(node):
+        if isinstance(call, ast.Call) and isinstance(call.func, ast.Attribute) and call.func.attr in DRAWS:
+            return isinstance(call.func.value, ast.Name) and call.func.value.id == 'st'
+    return False
+
+
+def importtime(lines):
+    # -> (total seconds, {top level module: cumulative seconds}, loaded modules) for a fresh interpreter
+    code = '\n'.join(lines + ['import sys', f'print(",".join(m for m in {HEAVY!r} if m in sys.modules))'])
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    top = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = [part for part in line[len('import time:'):].split('|')]
+        if not name.startswith('  '):  # only the top level entries, their time includes their own imports
+            top[name.strip()] = top.get(name.strip(), 0) + int(cumulative) / 1e6
+    loaded = [module for module in result.stdout.strip().split(',') if module]
+    return sum(top.values()), top, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5, help="fresh interpreters per measurement, the best one counts")
+    parser.add_argument('--top', type=int, default=6, help="heaviest top level imports to list")
+    args = parser.parse_args()
+
+    before, every = app_imports()
+    for name, lines in [('first render', before), ('full app', every)]:
+        runs = [importtime(lines) for _ in range(args.runs)]
+        total, top, loaded = min(runs, key=lambda run: run[0])
+        heaviest = sorted(top.items(), key=lambda item: -item[1])[:args.top]
+        print(f"{name:>12}: {total:.3f}s in imports (best of {args.runs}), loaded: {', '.join(loaded) or 'none of ' + '/'.join(HEAVY)}")
+        for module, seconds in heaviest:
+            print(f"{'':>14}{module:<28} {seconds:.3f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+import circle_api  # noqa: E402
+from authors import AuthorIndex  # noqa: E402
+from circle_api import STATS, request_access_token  # noqa: E402
+from ingest import build_events_frame, build_frames, merge_events, page_columns  # noqa: E402
+from stats import event_stats, post_stats  # noqa: E402
+from sync import stream_all_events, sync_posts  # noqa: E402
+from synthetic import SyntheticCommunity  # noqa: E402
+from valuation import (build_rollup, excluded_mask, filter_events, pull_most_valuable_people,  # noqa: E402
+                       pull_most_valuable_posts)
+
+
+# The whole data path, offline, at several community sizes:
+#   pull_posts / pull_events = what pull_all_posts / pull_all_events do on a cold start (sync_posts and
+#       the events stream, nothing stored), paged from a mock_api.py server started per size
+#   build_rollup, people_*, posts_*, events_ranking = the valuation functions
+#   post_stats / event_stats = the statistics section
+# Communities above --max-pull skip the server, their frames are built from the same records in process.
+# The pulls run once (they mostly measure --rate and --latency), everything else is the best of --repeat.
+# Every run is appended to --history (one JSON line: when, commit, versions, settings, results) and
+# compared with the last run that used the same settings, so a slowdown shows up next to its commit
+# usage: python benchmarks/bench_suite.py --sizes 10000 100000 1000000 --label "before the cache change"
+
+MOCK = Path(__file__).resolve().parent / 'mock_api.py'
+HISTORY = Path(__file__).resolve().parent / 'results' / 'history.jsonl'
+WEIGHTS = {'like': 1, 'comment': 2, 'basic': 1, 'image': 2}
+EVENT_WEIGHTS = {'like': 1, 'comment': 2, 'attendees': 2, 'duration': 2}
+TOP_NUMBER = 10
+
+
+@contextmanager
+def mock_server(args, n_posts):
+    # a mock_api.py process (its own interpreter, so serving doesn't take the GIL from the client)
+    # with the client pointed at it, yields an access token
+    command = [sys.executable, str(MOCK), '--posts', str(n_posts), '--port', '0', '--latency', str(args.latency),
+               '--throttle', str(args.throttle), '--retry-after', str(args.retry_after), '--seed', str(args.seed)]
+    server = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    urls = dict(server.stdout.readline().strip().split('=', 1) for _ in range(2))
+    saved = circle_api.BASE_URL, circle_api.AUTH_URL
+    circle_api.BASE_URL, circle_api.AUTH_URL = urls['CIRCLE_API_URL'], urls['CIRCLE_AUTH_URL']
+    try:
+        yield request_access_token('bench-token', 'bench@example.com')
+    finally:
+        circle_api.BASE_URL, circle_api.AUTH_URL = saved
+        server.terminate()
+        server.wait()
+
+
+def timed_once(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def best_of(fn, repeat):
+    runs = [timed_once(fn) for _ in range(repeat)]
+    return min(seconds for seconds, _ in runs), runs[-1][1]
+
+
+def measured_pull(name, fn):
+    # -> (frame, result) with the API counters of just this pull
+    STATS.reset()
+    seconds, frame = timed_once(fn)
+    api = STATS.snapshot()
+    return frame, {'bench': name, 'seconds': seconds, 'rows': len(frame), 'requests': api['requests'],
+                   'retries': api['retries'], 'throttled': api['throttled'], 'bytes': api['bytes']}
+
+
+def pull(args, n_posts):
+    # -> (posts, events, results) through a mock server
+    with mock_server(args, n_posts) as access_token:
+        posts, posts_result = measured_pull('pull_posts', lambda: sync_posts(
+            access_token, max_workers=args.workers, rate=args.rate)['posts'])
+        events, events_result = measured_pull('pull_events', lambda: last(stream_all_events(
+            access_token, max_workers=args.workers, rate=args.rate)))
+    return posts, events, [posts_result, events_result]
+
+
+def last(frames):
+    frame = None
+    for frame in frames:
+        pass
+    return frame
+
+
+def build_in_process(args, n_posts):
+    # the frames sync_posts / the events stream would end up with, without a server
+    community = SyntheticCommunity(n_posts, seed=args.seed)
+    posts, _ = build_frames(page_columns(records) for space_id in community.space_posts
+                            for records in community.space_pages(space_id))
+    events = merge_events([build_events_frame(records) for records in community.event_pages()])
+    return posts, events
+
+
+def in_memory(posts, events, repeat, label):
+    posts.attrs['snapshot'] = label  # lets the AuthorIndex match its frame, like a pulled snapshot
+    rollup = build_rollup(posts)
+    rollup.attrs['snapshot'] = label
+    index = AuthorIndex(rollup)
+    latest = pd.to_datetime(posts['Date']).max().strftime('%Y-%m-%d')
+    names = posts['Author'].value_counts().index[:10].astype(str).tolist() + ['Membr 1']  # one typo, for the hints
+    excluded = ', '.join(names)
+    cases = [
+        ('build_rollup', lambda: build_rollup(posts)),
+        ('people_all_time', lambda: pull_most_valuable_people(rollup, TOP_NUMBER, WEIGHTS, month=0)),
+        ('people_one_month', lambda: pull_most_valuable_people(rollup, TOP_NUMBER, WEIGHTS, month=3, specific_date=latest)),
+        ('people_payout', lambda: pull_most_valuable_people(rollup, TOP_NUMBER, WEIGHTS, month=0, filter_admins=True,
+                                                            filter_mods=True, amount=1000)),
+        ('posts_all_time', lambda: pull_most_valuable_posts(posts, TOP_NUMBER, WEIGHTS, month=0)),
+        ('posts_one_month', lambda: pull_most_valuable_posts(posts, TOP_NUMBER, WEIGHTS, month=3, specific_date=latest)),
+        ('author_index', lambda: AuthorIndex(rollup)),
+        ('people_excluded', lambda: pull_most_valuable_people(rollup, TOP_NUMBER, WEIGHTS, month=0,
+                                                             keep=excluded_mask(rollup, excluded, index=index))),
+        ('events_ranking', lambda: filter_events(events, EVENT_WEIGHTS, TOP_NUMBER)),
+        ('post_stats', lambda: post_stats(posts)),
+        ('event_stats', lambda: event_stats(events)),
+    ]
+    results = []
+    for name, fn in cases:
+        seconds, result = best_of(fn, repeat)
+        results.append({'bench': name, 'seconds': seconds, 'rows': len(result) if hasattr(result, '__len__') else None})
+    return results
+
+
+def git_commit():
+    # (short commit, uncommitted changes?) or (None, None) outside a git checkout
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip() != ''
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def previous_run(history, settings):
+    # the latest earlier run with the same settings, as {(size, bench): seconds}
+    if not history.exists():
+        return None, {}
+    match = None
+    for line in history.read_text().splitlines():
+        run = json.loads(line) if line.strip() else None
+        if run is not None and run.get('settings') == settings:
+            match = run
+    if match is None:
+        return None, {}
+    return match, {(result['size'], result['bench']): result['seconds'] for result in match['results']}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--max-pull', type=int, default=100_000,
+                        help="biggest community pulled through the mock server, bigger ones are built in process")
+    parser.add_argument('--repeat', type=int, default=3, help="runs of every in-memory benchmark, the best one counts")
+    parser.add_argument('--rate', type=float, default=500, help="client requests per second (the app uses 4)")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.0, help="mock server seconds per answer")
+    parser.add_argument('--throttle', type=float, default=0.0, help="share of the mock server answers that are 429s")
+    parser.add_argument('--retry-after', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--label', default='', help="a note stored with the run")
+    parser.add_argument('--history', type=Path, default=HISTORY)
+    parser.add_argument('--no-save', action='store_true', help="compare with the history but don't add this run")
+    args = parser.parse_args()
+
+    settings = {'max_pull': args.max_pull, 'repeat': args.repeat, 'rate': args.rate, 'workers': args.workers,
+                'latency': args.latency, 'throttle': args.throttle, 'retry_after': args.retry_after, 'seed': args.seed}
+    before, previous = previous_run(args.history, settings)
+    if before is not None:
+        print(f"compared with {before['run_at']} ({before.get('commit') or 'no commit'}{', ' + before['label'] if before.get('label') else ''})")
+
+    results = []
+    print(f"{'posts':>9} {'benchmark':<17} {'seconds':>9} {'before':>9} {'change':>7}  notes")
+    for n_posts in args.sizes:
+        if n_posts <= args.max_pull:
+            posts, events, pulled = pull(args, n_posts)
+        else:
+            posts, events = build_in_process(args, n_posts)
+            pulled = []
+        for result in pulled + in_memory(posts, events, args.repeat, f"bench@{n_posts}"):
+            result = {'size': n_posts, **result}
+            results.append(result)
+            old = previous.get((n_posts, result['bench']))
+            change = f"{(result['seconds'] / old - 1) * 100:+6.0f}%" if old else ''
+            notes = (f"{result['requests']} requests, {result['retries']} retries, {result['bytes'] / 2**20:.1f} MiB"
+                     if 'requests' in result else '')
+            print(f"{n_posts:>9} {result['bench']:<17} {result['seconds']:>9.4f} "
+                  f"{f'{old:.4f}' if old else '':>9} {change:>7}  {notes}")
+
+    commit, dirty = git_commit()
+    run = {'run_at': datetime.now(timezone.utc).isoformat(timespec='seconds'), 'label': args.label,
+           'commit': commit, 'dirty': dirty, 'python': platform.python_version(), 'pandas': pd.__version__,
+           'numpy': np.__version__, 'machine': platform.machine(), 'settings': settings, 'results': results}
+    if not args.no_save:
+        args.history.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.history, 'a') as f:
+            f.write(json.dumps(run) + '\n')
+        print(f"saved to {args.history}")
+
+
+if __name__ == '__main__':
+    main()
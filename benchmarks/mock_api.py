@@ -0,0 +1,158 @@
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from synthetic import SyntheticCommunity
+
+
+# A local stand-in for the parts of the Circle API the app uses, serving a SyntheticCommunity:
+#   POST /api/v1/headless/auth_token        -> an access token (the headless token 'bad' gets a 401)
+#   GET  /api/headless/v1/spaces             -> every space
+#   GET  /api/headless/v1/spaces/{id}/posts  -> the posts of a space newest first, paged like the API
+#   GET  /api/headless/v1/community_events   -> the events, paged
+#   GET  /api/headless/v1/community_members  -> the members, paged (the app only reads count)
+# --latency delays every answer, --throttle answers that share of the requests with a 429 and a
+# Retry-After, so the rate limiter and the retries get their share of the work as well.
+# It prints CIRCLE_API_URL=... and CIRCLE_AUTH_URL=..., with those two set the app and batch.py
+# run against it (any token and email work), bench_suite.py starts one per community size
+# usage: python benchmarks/mock_api.py --posts 100000 --latency 0.05 --throttle 0.02 --port 8765
+
+API_PATH = '/api/headless/v1'
+AUTH_PATH = '/api/v1/headless/auth_token'
+ACCESS_TOKEN = 'mock-access-token'
+MAX_PER_PAGE = 100
+
+
+def paged(total, page, per_page, records):
+    page_count = -(-total // per_page)
+    return {'page': page, 'per_page': per_page, 'has_next_page': page < page_count, 'count': total,
+            'page_count': page_count, 'records': records}
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the API, so the client's pooled connections get reused
+
+    def log_message(self, format, *args):
+        pass  # a line per request would bury the benchmark output
+
+    def send_json(self, status, data, headers=None):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def throttled(self):
+        # answers with a 429 for the --throttle share of the requests
+        if not self.server.throttle_next():
+            return False
+        self.send_json(429, {'message': 'Too many requests'}, {'Retry-After': str(self.server.retry_after)})
+        return True
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+        if urlparse(self.path).path != AUTH_PATH:
+            return self.send_json(404, {'message': 'Not found'})
+        if self.throttled():
+            return
+        token = self.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not token or token == 'bad' or not payload.get('email'):
+            return self.send_json(401, {'message': 'Your account could not be authenticated.'})
+        self.send_json(200, {'access_token': ACCESS_TOKEN, 'refresh_token': 'mock-refresh-token',
+                             'community_id': 1, 'community_member_id': 1})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        page = max(1, int(query.get('page', ['1'])[0]))
+        per_page = min(MAX_PER_PAGE, max(1, int(query.get('per_page', ['60'])[0])))
+        if self.headers.get('Authorization') != f"Bearer {ACCESS_TOKEN}":
+            return self.send_json(401, {'message': 'Your account could not be authenticated.'})
+        time.sleep(self.server.latency)  # a 429 takes as long as any other answer
+        if self.throttled():
+            return
+        community = self.server.community
+        parts = url.path.removeprefix(API_PATH).strip('/').split('/')
+        if parts == ['spaces']:
+            return self.send_json(200, community.spaces())
+        if len(parts) == 3 and parts[0] == 'spaces' and parts[2] == 'posts' and parts[1].isdigit() \
+                and int(parts[1]) in community.space_posts:
+            space_id = int(parts[1])
+            return self.send_json(200, paged(len(community.space_posts[space_id]), page, per_page,
+                                             community.space_page(space_id, page, per_page)))
+        if parts == ['community_events']:
+            return self.send_json(200, paged(community.n_events, page, per_page, community.event_page(page, per_page)))
+        if parts == ['community_members']:
+            return self.send_json(200, paged(community.n_members, page, per_page, community.member_page(page, per_page)))
+        self.send_json(404, {'message': 'Not found'})
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 64  # the default 5 drops the connects of 8 workers starting at once (1s SYN retry)
+
+    def __init__(self, community, host='127.0.0.1', port=0, latency=0.0, throttle=0.0, retry_after=0.1, seed=0):
+        super().__init__((host, port), MockHandler)
+        self.community = community
+        self.latency = latency
+        self.throttle = throttle
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.forced_429s = 0
+        self.requests = 0
+
+    def throttle_requests(self, count):
+        # the next `count` requests get a 429 whatever --throttle says (for the tests)
+        with self.lock:
+            self.forced_429s = count
+
+    def throttle_next(self):
+        with self.lock:
+            self.requests += 1
+            if self.forced_429s > 0:
+                self.forced_429s -= 1
+                return True
+            return self.random.random() < self.throttle
+
+    def urls(self):
+        host, port = self.server_address[:2]
+        return {'CIRCLE_API_URL': f"http://{host}:{port}{API_PATH}",
+                'CIRCLE_AUTH_URL': f"http://{host}:{port}{AUTH_PATH}"}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts', type=int, default=10_000)
+    parser.add_argument('--spaces', type=int, default=20)
+    parser.add_argument('--events', type=int, default=None, help="default: one per 200 posts")
+    parser.add_argument('--members', type=int, default=None, help="default: three per posting author")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds before every answer")
+    parser.add_argument('--throttle', type=float, default=0.0, help="share of the requests that get a 429")
+    parser.add_argument('--retry-after', type=float, default=0.1, help="seconds sent with every 429")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765, help="0 picks a free port")
+    args = parser.parse_args()
+
+    community = SyntheticCommunity(args.posts, args.spaces, args.events, args.members, seed=args.seed)
+    server = MockServer(community, args.host, args.port, args.latency, args.throttle, args.retry_after, args.seed)
+    for name, url in server.urls().items():
+        print(f"{name}={url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
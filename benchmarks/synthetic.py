@@ -0,0 +1,141 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+
+# Fake Circle posts shaped like the headless API records, for benchmarks that
+# should not touch the real API. Same seed = same community every time.
+
+POST_TYPES = ['basic', 'image', 'event']
+
+
+def synthetic_posts(n_posts, n_spaces=20, n_authors=None, seed=0):
+    # returns {space_id: [records newest first]} with n_posts records in total
+    rng = random.Random(seed)
+    n_authors = n_authors or max(10, n_posts // 20)
+    start = datetime(2023, 1, 1, tzinfo=timezone.utc)
+    spaces = {space_id: [] for space_id in range(1, n_spaces + 1)}
+    for i in range(n_posts):
+        space_id = rng.randint(1, n_spaces)
+        author_id = rng.randint(1, n_authors)
+        roles = ['admin'] if author_id % 97 == 0 else (['moderator'] if author_id % 53 == 0 else [])
+        created = start + timedelta(minutes=i * 3 + rng.randint(0, 2))
+        spaces[space_id].append({
+            'id': 10_000_000 + i,
+            'post_type': rng.choices(POST_TYPES, weights=[70, 25, 5])[0],
+            'display_title': f"Post number {i} about something",
+            'slug': f"post-number-{i}",
+            'comment_count': rng.randint(0, 30),
+            'user_likes_count': rng.randint(0, 120),
+            'created_at': created.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            'updated_at': created.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            'body': {'id': i, 'body': 'Some body text ' * 8, 'record_type': 'Post'},
+            'author': {'id': 5_000 + author_id, 'name': f"Member {author_id}", 'roles': roles,
+                       'avatar_url': f"https://example.com/{author_id}.png", 'headline': 'Member'},
+            'space': {'id': space_id, 'name': f"Space {space_id}", 'slug': f"space-{space_id}"},
+        })
+    for records in spaces.values():
+        records.reverse()  # the API returns newest first (sort=latest)
+    return spaces
+
+
+def pages(records, per_page=100):
+    return [records[i:i + per_page] for i in range(0, len(records), per_page)]
+
+
+# SyntheticCommunity: the same kind of records, but each one is made on demand from its number
+# (same seed = same records), so the stand-in API server (mock_api.py) can page through a
+# million posts without holding them. Spaces have uneven sizes like real ones, the newest post
+# is from the end of 2025 and the posts are spread over the two years before it
+
+END = datetime(2025, 12, 31, 23, 0, tzinfo=timezone.utc)
+SPAN_MINUTES = 2 * 365 * 24 * 60
+EVENT_LENGTHS = [1800, 3600, 5400]
+
+
+def api_time(moment):
+    return moment.strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+
+def roles_of(author_id):
+    return ['admin'] if author_id % 97 == 0 else (['moderator'] if author_id % 53 == 0 else [])
+
+
+class SyntheticCommunity:
+    def __init__(self, n_posts, n_spaces=20, n_events=None, n_members=None, seed=0):
+        self.seed = seed
+        self.n_posts = n_posts
+        self.n_authors = max(10, n_posts // 20)
+        self.n_events = n_events if n_events is not None else max(20, n_posts // 200)
+        self.n_members = n_members if n_members is not None else self.n_authors * 3
+        self.spacing = max(1, SPAN_MINUTES // max(1, n_posts))
+        self.event_spacing = max(1, SPAN_MINUTES // max(1, self.n_events))
+        rng = random.Random(seed)
+        owners = rng.choices(range(1, n_spaces + 1), weights=[rank ** -0.5 for rank in range(1, n_spaces + 1)], k=n_posts)
+        self.space_posts = {space_id: [] for space_id in range(1, n_spaces + 1)}
+        for number in range(n_posts - 1, -1, -1):  # newest first (sort=latest)
+            self.space_posts[owners[number]].append(number)
+
+    def rng(self, kind, number):
+        return random.Random((self.seed << 48) + (kind << 40) + number)  # an int seeds a lot faster than a str
+
+    def spaces(self):
+        return [{'id': space_id, 'name': f"Space {space_id}", 'slug': f"space-{space_id}", 'space_type': 'basic'}
+                for space_id in self.space_posts]
+
+    def author(self, author_id):
+        return {'id': 5_000 + author_id, 'name': f"Member {author_id}", 'roles': roles_of(author_id),
+                'avatar_url': f"https://example.com/{author_id}.png", 'headline': 'Member'}
+
+    def post(self, number, space_id):
+        rng = self.rng(1, number)
+        created = api_time(END - timedelta(minutes=(self.n_posts - 1 - number) * self.spacing + rng.randint(0, 2)))
+        return {
+            'id': 10_000_000 + number,
+            'post_type': rng.choices(POST_TYPES, weights=[70, 25, 5])[0],
+            'display_title': f"Post number {number} about something",
+            'slug': f"post-number-{number}",
+            'comment_count': rng.randint(0, 30),
+            'user_likes_count': rng.randint(0, 120),
+            'created_at': created,
+            'updated_at': created,
+            'body': {'id': number, 'body': 'Some body text ' * 8, 'record_type': 'Post'},
+            'author': self.author(rng.randint(1, self.n_authors)),
+            'space': {'id': space_id, 'name': f"Space {space_id}", 'slug': f"space-{space_id}"},
+        }
+
+    def event(self, number):
+        # events come newest first as well, spread over the same two years
+        rng = self.rng(2, number)
+        space_id = 1 + number % 3
+        return {
+            'id': 20_000_000 + number,
+            'name': f"Event number {number}",
+            'event_attendees': {'count': rng.randint(0, 300)},
+            'created_at': api_time(END - timedelta(minutes=number * self.event_spacing + rng.randint(0, 600))),
+            'comment_count': rng.randint(0, 40),
+            'user_likes_count': rng.randint(0, 150),
+            'event_setting_attributes': {'duration_in_seconds': rng.choice(EVENT_LENGTHS)},
+            'author': self.author(rng.randint(1, self.n_authors)),
+            'space': {'id': 100 + space_id, 'name': f"Events {space_id}", 'slug': f"events-{space_id}"},
+        }
+
+    def member(self, number):
+        return {'id': 5_000 + number, 'name': f"Member {number}", 'email': f"member{number}@example.com"}
+
+    def space_page(self, space_id, page, per_page=100):
+        numbers = self.space_posts[space_id][(page - 1) * per_page:page * per_page]
+        return [self.post(number, space_id) for number in numbers]
+
+    def event_page(self, page, per_page=100):
+        return [self.event(number) for number in range((page - 1) * per_page, min(self.n_events, page * per_page))]
+
+    def member_page(self, page, per_page=100):
+        return [self.member(number) for number in range((page - 1) * per_page, min(self.n_members, page * per_page))]
+
+    def space_pages(self, space_id, per_page=100):
+        for page in range(1, -(-len(self.space_posts[space_id]) // per_page) + 1):
+            yield self.space_page(space_id, page, per_page)
+
+    def event_pages(self, per_page=100):
+        for page in range(1, -(-self.n_events // per_page) + 1):
+            yield self.event_page(page, per_page)
@@ -0,0 +1,141 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+from instrument import METRICS
+
+
+# The statistics charts, drawn from the series stats.py makes. Every chart is an explicit
+# matplotlib Figure that is never registered with pyplot, so nothing piles up in pyplot's
+# global figure list between clicks: render_png draws it, saves it and lets it go. The app
+# caches the PNG bytes per (snapshot, chart). chart_data gives the same numbers as a plain
+# frame for Streamlit's own charts, which never need matplotlib at all, so matplotlib is
+# only imported the first time a PNG is actually drawn
+
+GOLD = '#D0BA71'
+GREY = '#E8E8E8'
+POST_TYPE_LABELS = {'basic': 'Text', 'image': 'Image'}
+
+
+def new_figure(figsize):
+    from matplotlib.figure import Figure  # only here, the native charts never pay for the import
+    figure = Figure(figsize=figsize)
+    return figure, figure.subplots()
+
+
+def month_labels(index):
+    return [str(month) for month in index]
+
+
+def plot_events(top_10_events):
+    figure, ax = new_figure((10, 6))
+    x = top_10_events['Date'].dt.strftime('%Y-%m-%d')
+    bars = ax.bar(x, top_10_events['Attendees'], color=GOLD, label='Attendees')
+    for bar in bars:
+        height = bar.get_height()
+        ax.text(bar.get_x() + bar.get_width() / 2, height + 50, f'{int(height)}',
+                ha='center', va='bottom', fontsize=9, color='black')
+    ax.set_title(f'Number of Attendees for the {len(top_10_events)} Most Recent Events', fontsize=18)
+    ax.set_xlabel('Event Date')
+    ax.set_ylabel('Number of Attendees')
+    ax.tick_params(axis='x', labelrotation=45)
+    for label in ax.get_xticklabels():
+        label.set_ha('right')
+    figure.tight_layout()
+    return figure
+
+
+def plot_post_type(post_type_counts):
+    figure, ax = new_figure((4, 4))
+    labels = [POST_TYPE_LABELS.get(label, label) for label in post_type_counts.index]
+    ax.pie(post_type_counts, labels=labels, autopct='%1.1f%%', colors=[GOLD, GREY], startangle=180)
+    ax.set_title('Distribution of Post Types')
+    return figure
+
+
+def bar_labels(ax, values, offset, ha='center', fontsize=10):
+    for i, v in enumerate(values):
+        ax.text(i, v + offset, f'{round(v):.0f}', ha=ha, va='bottom', fontsize=fontsize)
+
+
+def month_axis(ax, labels, title, ylabel, title_size=18, label_size=14):
+    ax.set_xticks(np.arange(len(labels)), labels, rotation=45, ha='right')
+    ax.set_title(title, fontsize=title_size)
+    ax.set_xlabel('Month', fontsize=label_size)
+    ax.set_ylabel(ylabel, fontsize=label_size)
+
+
+def plot_posts_per_day(per_day):
+    figure, ax = new_figure((10, 6))
+    ax.bar(np.arange(len(per_day)), per_day['Posts'], color=GOLD)
+    month_axis(ax, month_labels(per_day.index), 'Average Number of Posts Per Day by Month', 'Average Posts per Day')
+    bar_labels(ax, per_day['Posts'], 0.05)
+    figure.tight_layout()
+    return figure
+
+
+def plot_likes_comments_per_day(per_day):
+    figure, ax = new_figure((12, 6))
+    x = np.arange(len(per_day))
+    ax.bar(x - 0.2, per_day['Likes'], width=0.4, color=GOLD, label='Avg Likes Per Day')
+    ax.bar(x + 0.2, per_day['Comments'], width=0.4, color=GREY, label='Avg Comments Per Day')
+    month_axis(ax, month_labels(per_day.index), 'Average Likes and Comments Per Day by Month', 'Average Per Day')
+    ax.legend(fontsize=14)
+    bar_labels(ax, per_day['Likes'], 0.05, ha='right', fontsize=9)
+    bar_labels(ax, per_day['Comments'], 0.05, ha='left', fontsize=9)
+    figure.tight_layout()
+    return figure
+
+
+def plot_top_spaces(top_5_spaces, what):
+    # what: 'Likes' or 'Comments'
+    figure, ax = new_figure((8, 6))
+    ax.bar(np.arange(len(top_5_spaces)), top_5_spaces, color=GOLD, width=0.8, label=what)
+    ax.set_xticks(np.arange(len(top_5_spaces)), [str(space) for space in top_5_spaces.index], rotation=45, ha='right')
+    ax.set_title(f'Top 5 Spaces with Highest Average {what}', fontsize=14)
+    ax.set_xlabel('Space Name', fontsize=12)
+    ax.set_ylabel(f'Average {what}', fontsize=12)
+    ax.legend(loc='upper right')
+    for i, v in enumerate(top_5_spaces):
+        ax.text(i, v + 0.5, str(int(v)), ha='center', va='bottom', fontsize=10)
+    figure.tight_layout()
+    return figure
+
+
+CHARTS = {
+    'events': plot_events,
+    'post_types': plot_post_type,
+    'posts_per_day': plot_posts_per_day,
+    'likes_comments_per_day': plot_likes_comments_per_day,
+    'space_likes': lambda data: plot_top_spaces(data, 'Likes'),
+    'space_comments': lambda data: plot_top_spaces(data, 'Comments'),
+}
+
+
+def render_png(chart, data, dpi=100):
+    # draws one chart to PNG bytes, the Figure is dropped right after (nothing else refers to it)
+    with METRICS.phase(f'chart.{chart}'):
+        figure = CHARTS[chart](data)
+        buffer = io.BytesIO()
+        figure.savefig(buffer, format='png', dpi=dpi)
+        figure.clear()
+    return buffer.getvalue()
+
+
+def chart_data(chart, data):
+    # (title, frame) for the data only version of a chart: one row per bar, one column per series
+    if chart == 'events':
+        return (f'Number of Attendees for the {len(data)} Most Recent Events',
+                pd.DataFrame({'Attendees': data['Attendees'].to_numpy()}, index=data['Date'].dt.strftime('%Y-%m-%d')))
+    if chart == 'post_types':
+        return ('Distribution of Post Types',
+                data.rename(index=lambda label: POST_TYPE_LABELS.get(label, label)).rename('Posts').to_frame())
+    if chart == 'posts_per_day':
+        return 'Average Number of Posts Per Day by Month', data[['Posts']].set_axis(month_labels(data.index))
+    if chart == 'likes_comments_per_day':
+        return ('Average Likes and Comments Per Day by Month',
+                data[['Likes', 'Comments']].set_axis(month_labels(data.index)))
+    what = 'Likes' if chart == 'space_likes' else 'Comments'
+    return (f'Top 5 Spaces with Highest Average {what}',
+            data.rename(what).set_axis([str(space) for space in data.index]).to_frame())
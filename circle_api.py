@@ -0,0 +1,327 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait as wait_for
+from email.utils import parsedate_to_datetime
+
+import requests
+
+from instrument import METRICS
+
+try:
+    from orjson import loads as decode_json  # about twice as fast on a page of posts, straight from the bytes
+except ImportError:
+    from json import loads as decode_json
+
+
+# CIRCLE_API_URL / CIRCLE_AUTH_URL send everything somewhere else, e.g. to the local stand-in
+# server of the benchmarks (benchmarks/mock_api.py)
+BASE_URL = os.environ.get("CIRCLE_API_URL", "https://app.circle.so/api/headless/v1")
+AUTH_URL = os.environ.get("CIRCLE_AUTH_URL", "https://app.circle.so/api/v1/headless/auth_token")
+
+# Paging engine settings -- every thread shares ONE rate limiter, so the total time
+# depends on the API rate limit and not on how many spaces a community has
+MAX_CONCURRENT_REQUESTS = 8
+REQUESTS_PER_SECOND = 4  # same pace as the old time.sleep(.25) between pages
+# when several communities are pulled at once each keeps its own limiter (the API limit is per
+# token) and all of them also share this budget, so a big comparison can't flood the network
+GLOBAL_REQUESTS_PER_SECOND = 16
+PER_PAGE = 100
+PROGRESS_INTERVAL = 0.5  # seconds between progress callbacks
+
+# Retry settings: connection errors, timeouts, 429s and 5xx responses are retried with
+# exponential backoff + full jitter, a Retry-After header from the API always wins
+REQUEST_TIMEOUT = (5, 30)  # (connect, read) seconds
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    # Thread safe token bucket: acquire() blocks until a request is allowed.
+    # rate = tokens added per second, capacity = how big a burst can be,
+    # parent = a bucket shared with other pulls that has to allow the request as well
+    def __init__(self, rate=REQUESTS_PER_SECOND, capacity=None, parent=None):
+        self.rate = float(rate)
+        self.parent = parent
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    break
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+        if self.parent is not None:
+            self.parent.acquire()
+
+    def hold(self, seconds):
+        # nobody gets a token for the next `seconds` (the API told us to slow down), several threads
+        # told to wait at the same time wait for the longest of them, not for all of them added up
+        with self.lock:
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class ApiStats:
+    # Thread safe counters for every call that goes through request()
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = 0
+            self.retries = 0
+            self.throttled = 0  # 429 responses
+            self.failures = 0  # calls that still failed after all the retries
+            self.bytes = 0  # response bodies downloaded
+            self.latency_total = 0.0
+            self.latency_max = 0.0
+
+    def record(self, latency):
+        with self.lock:
+            self.requests += 1
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+
+    def count(self, name, amount=1):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def snapshot(self):
+        with self.lock:
+            return {'requests': self.requests,
+                    'retries': self.retries,
+                    'throttled': self.throttled,
+                    'failures': self.failures,
+                    'bytes': self.bytes,
+                    'latency_total': self.latency_total,
+                    'latency_avg': self.latency_total / self.requests if self.requests else 0.0,
+                    'latency_max': self.latency_max}
+
+
+STATS = ApiStats()
+METRICS.add_source('api', STATS.snapshot)
+
+
+def make_session(pool_size=MAX_CONCURRENT_REQUESTS):
+    # keep-alive session with room for one open connection per worker thread
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def shared_session():
+    # the process wide session, so every helper and every rerun reuses the same open connections
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = make_session()
+        return _session
+
+
+def retry_after(response):
+    # seconds the API asked us to wait (Retry-After is either seconds or an HTTP date), or None
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff(attempt):
+    # full jitter: anywhere between 0 and the exponential cap
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def request(method, url, session=None, bucket=None, retries=MAX_RETRIES, timeout=REQUEST_TIMEOUT, **kwargs):
+    # One API call with retries. Returns the last response (callers check the status like before),
+    # only raises when the connection itself still fails after the last retry
+    session = session or shared_session()
+    for attempt in range(retries + 1):
+        if bucket is not None:
+            bucket.acquire()
+        start = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            STATS.record(time.perf_counter() - start)
+            if attempt == retries:
+                STATS.count('failures')
+                raise
+            STATS.count('retries')
+            time.sleep(backoff(attempt))
+            continue
+        STATS.record(time.perf_counter() - start)
+        STATS.count('bytes', len(response.content))
+        if response.status_code not in RETRY_STATUSES:
+            return response
+        if response.status_code == 429:
+            STATS.count('throttled')
+        if attempt == retries:
+            STATS.count('failures')
+            return response
+        STATS.count('retries')
+        wait = retry_after(response)
+        if wait is None:
+            wait = backoff(attempt)
+        elif bucket is not None:
+            bucket.hold(wait)  # the other threads sharing the bucket back off as well
+        time.sleep(wait)
+    return response
+
+
+def get_page(session, bucket, url, access_token, params, page):
+    METRICS.count('pages')
+    with METRICS.phase('page_fetch'):  # waiting for the rate limiter included
+        response = request('GET', url, session=session, bucket=bucket,
+                           headers={'Authorization': access_token}, params={**params, 'page': page})
+    response.raise_for_status()  # an error page would otherwise look like the last page
+    return decode_json(response.content)
+
+
+def fetch_pages(session, bucket, url, access_token, params=None, stop=None, first_page=1):
+    # Yields the records of each page of a paginated headless endpoint, following has_next_page.
+    # stop(records) -> True ends the paging after that page (used by the incremental sync)
+    params = dict(params or {})
+    page = first_page
+    while True:
+        data = get_page(session, bucket, url, access_token, params, page)
+        records = data.get('records')
+        if not records:
+            break
+        yield records
+        if not data.get("has_next_page", False) or (stop is not None and stop(records)):
+            break
+        page += 1
+
+
+def stream_pages(access_token, url, params=None, max_workers=MAX_CONCURRENT_REQUESTS, rate=REQUESTS_PER_SECOND,
+                 budget=None):
+    # Yields each page's records in page order as soon as it is ready, for ONE endpoint.
+    # The first page tells us page_count, then the rest are pulled in parallel
+    # (if the API doesn't send page_count we just follow has_next_page one by one)
+    # budget = an optional TokenBucket shared with other pulls running at the same time
+    params = dict(params or {})
+    bucket = TokenBucket(rate, parent=budget)
+    session = shared_session()
+    first = get_page(session, bucket, url, access_token, params, 1)
+    if not first.get('records'):
+        return
+    yield first['records']
+    if not first.get("has_next_page", False):
+        return
+    page_count = first.get('page_count')
+    if page_count is None:
+        yield from fetch_pages(session, bucket, url, access_token, params, first_page=2)
+        return
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        pulled = pool.map(lambda page: get_page(session, bucket, url, access_token, params, page),
+                          range(2, page_count + 1))
+        for data in pulled:
+            if data.get('records'):
+                yield data['records']
+
+
+def spaces_url():
+    return f"{BASE_URL}/spaces"
+
+
+def space_posts_url(space_id):
+    return f"{BASE_URL}/spaces/{space_id}/posts"
+
+
+def events_url():
+    return f"{BASE_URL}/community_events"
+
+
+def fetch_all_space_posts(access_token, space_ids, max_workers=MAX_CONCURRENT_REQUESTS,
+                          rate=REQUESTS_PER_SECOND, handle_page=None, stop_paging=None,
+                          checkpoint=None, progress=None, budget=None):
+    # Pages every space in parallel (pages inside ONE space are still in order).
+    # handle_page(space_id, records) turns a page into whatever the caller wants to keep,
+    # stop_paging(space_id, records) -> True stops that space early (posts come newest first),
+    # checkpoint (store.PageCheckpoint) keeps every handled page so a failed pull resumes after
+    # the last stored page of each space, progress(spaces_done, space_count, pages_done) gets
+    # called from the calling thread while the workers run, budget = an optional TokenBucket
+    # shared with other pulls running at the same time,
+    # returns {space_id: [handled page, handled page, ...]} in the same order as space_ids
+    space_ids = list(space_ids)
+    if handle_page is None:
+        handle_page = lambda space_id, records: records
+    bucket = TokenBucket(rate, parent=budget)
+    session = shared_session()
+    counts = {'spaces': 0, 'pages': 0}
+    counts_lock = threading.Lock()
+
+    @METRICS.timed('space_paging')
+    def pull_space(space_id):
+        handled = list(checkpoint.pages(space_id)) if checkpoint is not None else []
+        with counts_lock:
+            counts['pages'] += len(handled)
+        if checkpoint is None or not checkpoint.done(space_id):
+            params = {'sort': 'latest', 'per_page': PER_PAGE}
+            stop = None
+            if stop_paging is not None:
+                stop = lambda records: stop_paging(space_id, records)
+            for records in fetch_pages(session, bucket, space_posts_url(space_id), access_token, params, stop,
+                                       first_page=len(handled) + 1):
+                page = handle_page(space_id, records)
+                if checkpoint is not None:
+                    checkpoint.add_page(space_id, page)
+                handled.append(page)
+                with counts_lock:
+                    counts['pages'] += 1
+            if checkpoint is not None:
+                checkpoint.finish(space_id)
+        with counts_lock:
+            counts['spaces'] += 1
+        return handled
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(space_ids) or 1))) as pool:
+        futures = [pool.submit(pull_space, space_id) for space_id in space_ids]
+        pending = set(futures)
+        while pending:
+            _, pending = wait_for(pending, timeout=PROGRESS_INTERVAL, return_when=FIRST_EXCEPTION)
+            if progress is not None:
+                with counts_lock:
+                    progress(counts['spaces'], len(space_ids), counts['pages'])
+        results = [future.result() for future in futures]  # re-raises the first failed space
+    return dict(zip(space_ids, results))
+
+
+@METRICS.timed('token_exchange')
+def request_access_token(first_token, email):
+    # exchanges the headless auth token for an access token, 1 means a bad token or email
+    response = request('POST', AUTH_URL, headers={"Authorization": "Bearer " + first_token}, json={"email": email})
+    if response.status_code != 200:
+        return 1
+    return "Bearer " + response.json()['access_token']
+
+
+def get_member_count(access_token):
+    response = request('GET', f"{BASE_URL}/community_members", headers={"Authorization": access_token},
+                       params={"page": 1, "per_page": 1})
+    return response.json().get('count')
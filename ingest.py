@@ -0,0 +1,284 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from instrument import METRICS
+
+
+# Turning raw API records into the typed posts frame (plus the authors dimension table).
+# The pages are only collected while paging, the frame gets built ONE time at the end
+# (concatenating a growing frame on every page copies everything again and again)
+#
+# The posts frame is kept compact because st.cache_data pickles and copies it on every hit:
+# repeated strings are categoricals, titles are Arrow strings, counts are int32 and the
+# list-valued Author_Roles lives in the authors table (one row per author, not per post)
+#
+# A page only ever becomes the few fields we keep (page_columns), and the typed columns are made
+# straight from those lists (post_frame). Nothing builds an untyped frame first: pandas would
+# turn every text field into a str column, only for it to be converted once more
+
+RAW_POST_COLUMNS = ['post_type', 'display_title', 'comment_count', 'user_likes_count',
+                    'created_at', 'author.name', 'space.name', 'author.roles', 'author.id', 'id']
+
+POST_RENAMES = {
+    'display_title': 'Title',
+    'author.name': 'Author',
+    'comment_count': 'Comments',
+    'user_likes_count': 'Likes',
+    'created_at': 'Date',
+    'space.name': 'Space_Name',
+    'post_type': 'Post_Type',
+    'author.roles': 'Author_Roles',
+    'author.id': 'Author_ID',
+    'id': 'Post_ID',
+    'role_mask': 'Role_Mask'
+}
+
+POST_COLUMNS = ['Title', 'Author', 'Date', 'Likes', 'Comments', 'Post_Type', 'Space_Name',
+                'Role_Mask', 'Author_ID', 'Post_ID']
+
+AUTHOR_COLUMNS = ['Author_ID', 'Author', 'Author_Roles', 'Role_Mask']
+
+# Author_Roles encoded ONCE at ingest as a small bitmask, so the admin/mod filters are a single
+# vectorized & instead of a Python loop over the list column on every query
+ROLE_ADMIN = 1
+ROLE_MODERATOR = 2
+ROLE_ADMIN_NAME = 4  # 'admin' in the display name, the admin filter drops these people as well
+ADMIN_MASK = ROLE_ADMIN | ROLE_ADMIN_NAME
+
+
+def role_mask(roles, name):
+    mask = 0
+    if roles and 'admin' in roles:
+        mask |= ROLE_ADMIN
+    if roles and 'moderator' in roles:
+        mask |= ROLE_MODERATOR
+    if name and 'admin' in name.lower():
+        mask |= ROLE_ADMIN_NAME
+    return mask
+
+
+# one shared tuple per distinct set of roles, instead of a list per post: while a big pull is held
+# in memory every one of those lists would be walked again by each full garbage collection
+ROLE_SETS = {}
+
+
+def role_set(roles):
+    roles = tuple(roles or ())
+    return ROLE_SETS.setdefault(roles, roles)
+
+
+def parse_dates(values):
+    # API timestamps -> UTC datetimes. Arrow reads the API's ISO 8601 about ten times faster than
+    # pd.to_datetime, anything it can't read goes that slower way (which turns bad values into NaT)
+    if any(values):  # a column without a single date gets whatever unit pandas gives it
+        try:
+            return pd.Series(pa.array(values, type=pa.string()).cast(pa.timestamp('us', 'UTC')).to_pandas())
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            pass
+    return pd.to_datetime(pd.Series(values, dtype=object), errors='coerce', utc=True, format='ISO8601')
+
+
+def post_frame(columns):
+    # the page_columns() lists of a pull -> a frame with the posts frame's dtypes
+    return pd.DataFrame({
+        'Title': pd.array(columns['display_title'], dtype='string[pyarrow]'),
+        'Author': pd.Categorical(columns['author.name']),
+        'Date': parse_dates(columns['created_at']),
+        'Likes': pd.to_numeric(pd.Series(columns['user_likes_count']), errors='coerce').fillna(0).astype('int32'),
+        'Comments': pd.to_numeric(pd.Series(columns['comment_count']), errors='coerce').fillna(0).astype('int32'),
+        'Post_Type': pd.Categorical(columns['post_type']),
+        'Space_Name': pd.Categorical(columns['space.name']),
+        'Role_Mask': np.array(columns['role_mask'], dtype='uint8'),
+        'Author_ID': pd.to_numeric(pd.Series(columns['author.id']), errors='coerce').astype('Int64'),
+        'Post_ID': pd.to_numeric(pd.Series(columns['id']), errors='coerce').astype('Int64'),
+        'Author_Roles': pd.Series(columns['author.roles'], dtype=object),
+    })
+
+
+def as_post_dtypes(df):
+    # explicit dtypes for the posts frame (returns a new frame)
+    return pd.DataFrame({
+        'Title': df['Title'].astype(object).astype('string[pyarrow]'),
+        'Author': df['Author'].astype(object).astype('category'),
+        'Date': pd.to_datetime(df['Date'], errors='coerce', utc=True, format='ISO8601'),
+        'Likes': pd.to_numeric(df['Likes'], errors='coerce').fillna(0).astype('int32'),
+        'Comments': pd.to_numeric(df['Comments'], errors='coerce').fillna(0).astype('int32'),
+        'Post_Type': df['Post_Type'].astype(object).astype('category'),
+        'Space_Name': df['Space_Name'].astype(object).astype('category'),
+        'Role_Mask': df['Role_Mask'].fillna(0).astype('uint8'),
+        'Author_ID': pd.to_numeric(df['Author_ID'], errors='coerce').astype('Int64'),  # 'Int64' handles NaN values as well
+        'Post_ID': pd.to_numeric(df['Post_ID'], errors='coerce').astype('Int64'),
+    }, index=df.index)
+
+
+def sort_posts(df):
+    return df.sort_values(by='Date', ascending=False, kind='stable').reset_index(drop=True)
+
+
+@METRICS.timed('normalize_posts')
+def page_columns(records):
+    # only the fields we keep from one page of raw posts, as plain per-column lists
+    # (much cheaper than pd.json_normalize, which flattens every nested field of every post)
+    columns = {name: [] for name in RAW_POST_COLUMNS + ['role_mask']}
+    for record in records:
+        author = record.get('author') or {}
+        space = record.get('space') or {}
+        roles = role_set(author.get('roles'))
+        columns['post_type'].append(record.get('post_type'))
+        columns['display_title'].append(record.get('display_title'))
+        columns['comment_count'].append(record.get('comment_count'))
+        columns['user_likes_count'].append(record.get('user_likes_count'))
+        columns['created_at'].append(record.get('created_at'))
+        columns['author.name'].append(author.get('name'))
+        columns['space.name'].append(space.get('name'))
+        columns['author.roles'].append(roles)
+        columns['author.id'].append(author.get('id'))
+        columns['id'].append(record.get('id'))
+        columns['role_mask'].append(role_mask(roles, author.get('name')))
+    return columns
+
+
+@METRICS.timed('build_frames')
+def build_frames(pages):
+    # pages = the page_columns() of every page -> (posts, authors), each built one time
+    columns = {name: [] for name in RAW_POST_COLUMNS + ['role_mask']}
+    for page in pages:
+        for name in columns:
+            columns[name].extend(page[name])
+    posts = post_frame(columns)
+    del columns  # the lists (and every string in them) can go before the filters copy the frame
+    posts = posts[posts['Post_Type'] != "event"]
+    # a resumed pull can see a post twice (newer posts push older ones onto the next page)
+    posts = posts[~posts['Post_ID'].duplicated(keep='last') | posts['Post_ID'].isna()]
+    posts = posts.assign(**{name: posts[name].cat.remove_unused_categories()  # no 'event' slice in the charts
+                            for name in ['Author', 'Post_Type', 'Space_Name']})
+    authors = pd.DataFrame({
+        'Author_ID': posts['Author_ID'],
+        'Author': posts['Author'].astype(object),
+        'Author_Roles': posts['Author_Roles'],
+        'Role_Mask': posts['Role_Mask'],
+        'Date': posts['Date']
+    })
+    # newest post first, so each author keeps their latest name and roles
+    authors = as_authors(authors.sort_values(by='Date', ascending=False, kind='stable'))
+    authors['Author_Roles'] = authors['Author_Roles'].map(list)  # only the authors get their own list
+    return sort_posts(posts[POST_COLUMNS]), authors
+
+
+def build_posts_frame(pages):
+    return build_frames(pages)[0]
+
+
+def as_authors(authors):
+    # one row per Author_ID, the first row of each author wins
+    authors = authors[authors['Author_ID'].notna()].drop_duplicates(subset='Author_ID', keep='first')
+    return authors[AUTHOR_COLUMNS].sort_values(by='Author_ID').reset_index(drop=True)
+
+
+def merge_authors(old_authors, new_authors):
+    # the freshly pulled name/roles of an author replace the stored ones
+    if old_authors is None:
+        return new_authors
+    return as_authors(pd.concat([new_authors, old_authors], ignore_index=True))
+
+
+def merge_posts(old_posts, new_posts):
+    # old_posts can be None for a first pull, the newly pulled rows win so refreshed
+    # like/comment counts replace the old ones
+    if old_posts is None:
+        return new_posts
+    merged = pd.concat([old_posts, new_posts], ignore_index=True)
+    merged = merged.drop_duplicates(subset='Post_ID', keep='last')
+    return sort_posts(as_post_dtypes(merged))  # concat loses the categories when they differ
+
+
+RAW_EVENT_COLUMNS = ['name', 'event_attendees.count', 'created_at', 'comment_count', 'user_likes_count',
+                     'author.name', 'event_setting_attributes.duration_in_seconds', 'space.name', 'author.roles',
+                     'id', 'author.id']
+
+EVENT_COLUMNS = ['Event_Title', 'Attendees', 'Author', 'Date', 'Likes', 'Comments', 'Length_Minutes',
+                 'Space_Name', 'Author_Roles', 'Author_ID', 'Post_ID']
+
+
+def project(records, fields):
+    # {'a.b': [record['a']['b'] of every record]} for just these fields, a missing one is NaN
+    # (pd.json_normalize flattens every nested field of every record, to keep a handful of them)
+    columns = {}
+    for field in fields:
+        path = field.split('.')
+        values = []
+        for record in records:
+            value = record
+            for key in path:
+                value = value.get(key, np.nan) if isinstance(value, dict) else np.nan
+            values.append(value)
+        columns[field] = values
+    return columns
+
+
+@METRICS.timed('normalize_events')
+def build_events_frame(records):
+    # one page (or more) of raw event records -> the events frame
+    if not records:
+        return pd.DataFrame(columns=EVENT_COLUMNS)
+    event_df = pd.DataFrame(project(records, RAW_EVENT_COLUMNS))
+    event_df = event_df[~event_df['space.name'].str.contains('Moderator Training Space', na=False)]
+    filt = event_df.rename(columns={
+        'name': 'Event_Title',
+        'event_attendees.count': 'Attendees',
+        'created_at': 'Date',
+        'comment_count': 'Comments',
+        'user_likes_count': 'Likes',
+        'author.name': 'Author',
+        'event_setting_attributes.duration_in_seconds': 'Length_Minutes',
+        'space.name': 'Space_Name',
+        'author.roles': 'Author_Roles',
+        'author.id': 'Author_ID',
+        'id': 'Post_ID'
+    })
+
+    # Format the 'Date' column to show only 'YYYY-MM-DD'
+    filt['Date'] = pd.to_datetime(filt['Date']).dt.strftime('%Y-%m-%d')
+
+    # Convert 'Length.Minutes' from seconds to minutes, rounded to one decimal place
+    filt['Length_Minutes'] = (filt['Length_Minutes'] / 60).round(1)
+    filt['Post_ID'] = filt['Post_ID'].astype('Int64')  # 'Int64' handles NaN values as well
+    filt['Author_ID'] = filt['Author_ID'].astype('Int64')
+    return filt[EVENT_COLUMNS]
+
+
+def merge_events(frames):
+    # later frames win, so fresh pages replace the stored copy of the same event
+    frames = [frame for frame in frames if len(frame)]
+    if not frames:
+        return pd.DataFrame(columns=EVENT_COLUMNS)
+    merged = pd.concat(frames, ignore_index=True)
+    return merged.drop_duplicates(subset='Post_ID', keep='last').reset_index(drop=True)
+
+
+def add_events(events, page):
+    # the events so far plus one more page, the page wins for events that are in both. Only the
+    # page gets deduplicated and hashed, so adding page after page stays linear in the rows
+    page = page.drop_duplicates(subset='Post_ID', keep='last')
+    if not len(page):
+        return events
+    if not len(events):
+        return page.reset_index(drop=True)
+    kept = events[~events['Post_ID'].isin(page['Post_ID']).to_numpy()]
+    return pd.concat([kept, page], ignore_index=True)
+
+
+def combine_communities(frames):
+    # {community name: frame} -> one frame with a categorical Community column in front, for
+    # comparing communities side by side (the other categoricals are rebuilt, concat turns
+    # categories that differ between the frames into plain objects)
+    frames = {name: frame for name, frame in frames.items() if frame is not None}
+    if not frames:
+        return pd.DataFrame(columns=['Community'])
+    combined = pd.concat([frame.assign(Community=name) for name, frame in frames.items()], ignore_index=True)
+    combined['Community'] = pd.Categorical(combined['Community'], categories=list(frames))
+    for column in ['Author', 'Post_Type', 'Space_Name']:
+        if column in combined and not isinstance(combined[column].dtype, pd.CategoricalDtype):
+            combined[column] = combined[column].astype('category')
+    return combined[['Community'] + [column for column in combined.columns if column != 'Community']]
@@ -0,0 +1,155 @@
+import functools
+import json
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Where the time goes, for the whole process: per phase timings (token exchange, space ids,
+# paging, normalizing, valuation, charts), counters (pages, cache hits and misses), and values
+# that only have a latest reading (frame sizes). Other modules register a source, a callable
+# returning a flat dict of numbers (circle_api's request counters), which is read on export.
+# Everything is thread safe, the sync workers and the refresher record from their own threads.
+# Read it as a dict (snapshot), JSON (to_json) or Prometheus text (to_prometheus)
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sources = {}
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = time.time()
+            self.phases = {}  # name -> {'calls', 'seconds', 'max', 'last'}
+            self.counters = {}
+            self.values = {}
+
+    def record(self, name, seconds):
+        with self.lock:
+            phase = self.phases.setdefault(name, {'calls': 0, 'seconds': 0.0, 'max': 0.0, 'last': 0.0})
+            phase['calls'] += 1
+            phase['seconds'] += seconds
+            phase['max'] = max(phase['max'], seconds)
+            phase['last'] = seconds
+
+    @contextmanager
+    def phase(self, name):
+        # with METRICS.phase('space_ids'): ... records the time even when the block raises
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def timed(self, name):
+        # decorator version of phase()
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.phase(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set(self, name, value):
+        with self.lock:
+            self.values[name] = value
+
+    def add_source(self, name, snapshot):
+        self.sources[name] = snapshot
+
+    def snapshot(self):
+        with self.lock:
+            data = {'uptime': time.time() - self.started,
+                    'phases': {name: dict(phase) for name, phase in self.phases.items()},
+                    'counters': dict(self.counters),
+                    'values': dict(self.values)}
+        for name, source in self.sources.items():
+            data[name] = source()
+        return data
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2, sort_keys=True)
+
+    def to_prometheus(self, prefix='circle'):
+        return prometheus_text(self.snapshot(), prefix)
+
+
+def metric_name(*parts):
+    return re.sub(r'[^a-zA-Z0-9_]', '_', '_'.join(parts))
+
+
+def label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_text(data, prefix='circle'):
+    # a snapshot() dict (or several merged with merge_snapshots) in the Prometheus text format
+    lines = []
+
+    def family(name, kind, samples):
+        if samples:
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+
+    phases = data.get('phases', {})
+    for field, kind in [('seconds', 'counter'), ('calls', 'counter'), ('max', 'gauge'), ('last', 'gauge')]:
+        suffix = {'seconds': 'seconds_total', 'calls': 'calls_total', 'max': 'seconds_max', 'last': 'seconds_last'}[field]
+        family(metric_name(prefix, 'phase', suffix), kind,
+               [f'{metric_name(prefix, "phase", suffix)}{{phase="{label(name)}"}} {phase[field]}'
+                for name, phase in sorted(phases.items())])
+    family(metric_name(prefix, 'events_total'), 'counter',
+           [f'{metric_name(prefix, "events_total")}{{name="{label(name)}"}} {value}'
+            for name, value in sorted(data.get('counters', {}).items())])
+    family(metric_name(prefix, 'value'), 'gauge',
+           [f'{metric_name(prefix, "value")}{{name="{label(name)}"}} {value}'
+            for name, value in sorted(data.get('values', {}).items())])
+    family(metric_name(prefix, 'uptime_seconds'), 'gauge',
+           [f'{metric_name(prefix, "uptime_seconds")} {data["uptime"]}'] if 'uptime' in data else [])
+    for source, stats in sorted(data.items()):
+        if source in ('phases', 'counters', 'values', 'uptime') or not isinstance(stats, dict):
+            continue
+        for key, value in sorted(stats.items()):
+            if not isinstance(value, (int, float)):
+                continue
+            if key.endswith(('_avg', '_max')):
+                family(metric_name(prefix, source, key), 'gauge', [f'{metric_name(prefix, source, key)} {value}'])
+            else:  # the counters of a source only ever go up
+                name = metric_name(prefix, source, key.removesuffix('_total'), 'total')
+                family(name, 'counter', [f'{name} {value}'])
+    return '\n'.join(lines) + '\n'
+
+
+def merge_snapshots(snapshots):
+    # adds up the snapshots of several processes (the batch workers), maxima stay maxima
+    merged = {'phases': {}, 'counters': {}, 'values': {}}
+    for data in snapshots:
+        for name, phase in data.get('phases', {}).items():
+            total = merged['phases'].setdefault(name, {'calls': 0, 'seconds': 0.0, 'max': 0.0, 'last': 0.0})
+            total['calls'] += phase['calls']
+            total['seconds'] += phase['seconds']
+            total['max'] = max(total['max'], phase['max'])
+            total['last'] = phase['last']
+        for name, value in data.get('counters', {}).items():
+            merged['counters'][name] = merged['counters'].get(name, 0) + value
+        merged['values'].update(data.get('values', {}))
+        for source, stats in data.items():
+            if source in ('phases', 'counters', 'values') or not isinstance(stats, dict):
+                continue
+            totals = merged.setdefault(source, {})
+            for key, value in stats.items():
+                if key.endswith('_max'):
+                    totals[key] = max(totals.get(key, 0), value)
+                elif not key.endswith('_avg'):  # an average doesn't add up, sources also give the total
+                    totals[key] = totals.get(key, 0) + value
+    return merged
+
+
+METRICS = Metrics()
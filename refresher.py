@@ -0,0 +1,104 @@
+import threading
+import time
+import traceback
+
+
+# Background refresh: ONE daemon thread keeps every registered community warm, so a rerun only
+# ever reads the snapshot that is already in memory. The app hands in two callables:
+#   refresh(community, credentials) pulls and swaps in a new snapshot (one dict assignment)
+#   synced_at(community) -> epoch seconds of the snapshot in memory, None when there isn't one
+# A community is refreshed once its snapshot is `interval` seconds old, which is set below the
+# sync interval so the data is topped up before anybody would have to wait for it.
+# Every rerun that shows a community registers it again, a community nobody has looked at for
+# `idle_after` seconds is dropped (with its credentials) until somebody enters its token again
+REFRESH_INTERVAL = 45 * 60
+CHECK_EVERY = 30
+IDLE_AFTER = 6 * 60 * 60
+
+
+class Refresher:
+    def __init__(self, refresh, synced_at, interval=REFRESH_INTERVAL, check_every=CHECK_EVERY, idle_after=IDLE_AFTER):
+        self.refresh = refresh
+        self.synced_at = synced_at
+        self.interval = interval
+        self.check_every = check_every
+        self.idle_after = idle_after
+        self.jobs = {}  # community -> {'credentials', 'error', 'failed_at', 'seen_at'}
+        self.locks = {}  # community -> lock held while that community is being pulled
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+
+    def register(self, community, credentials):
+        # new credentials replace the old ones (the headless token of a community can change)
+        with self.lock:
+            job = self.jobs.setdefault(community, {'error': None, 'failed_at': None})
+            job['credentials'] = credentials
+            job['seen_at'] = time.time()
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='refresher', daemon=True)
+                self.thread.start()
+        self.wake.set()
+
+    def registered(self, community):
+        with self.lock:
+            return community in self.jobs
+
+    def lock_for(self, community):
+        # the foreground takes the same lock for a first pull, so a community is never pulled twice at once
+        with self.lock:
+            return self.locks.setdefault(community, threading.Lock())
+
+    def status(self, community):
+        # {'synced_at', 'age', 'error'} for showing how old the data is (None when not registered)
+        with self.lock:
+            job = self.jobs.get(community)
+            error = job['error'] if job else None
+        if job is None:
+            return None
+        synced_at = self.synced_at(community)
+        return {'synced_at': synced_at,
+                'age': time.time() - synced_at if synced_at is not None else None,
+                'error': error}
+
+    def due(self, community):
+        job = self.jobs[community]
+        if job['failed_at'] is not None and time.time() - job['failed_at'] < self.check_every * 4:
+            return False  # give a failing community a little room before trying again
+        synced_at = self.synced_at(community)
+        return synced_at is None or time.time() - synced_at >= self.interval
+
+    def drop_idle(self):
+        # the communities nobody has shown for idle_after seconds stop being refreshed
+        now = time.time()
+        with self.lock:
+            for community in [c for c, job in self.jobs.items() if now - job['seen_at'] >= self.idle_after]:
+                del self.jobs[community]
+
+    def refresh_due(self):
+        self.drop_idle()
+        with self.lock:
+            communities = list(self.jobs)
+        for community in communities:
+            with self.lock_for(community):
+                with self.lock:
+                    job = self.jobs.get(community)
+                if job is None or not self.due(community):  # dropped, or somebody else pulled it while we waited
+                    continue
+                with self.lock:
+                    credentials = job['credentials']
+                try:
+                    self.refresh(community, credentials)
+                    error, failed_at = None, None
+                except Exception as e:  # the old snapshot keeps being served, we try again later
+                    traceback.print_exc()
+                    error, failed_at = f"{type(e).__name__}: {e}", time.time()
+                with self.lock:
+                    job['error'] = error
+                    job['failed_at'] = failed_at
+
+    def run(self):
+        while True:
+            self.wake.clear()
+            self.refresh_due()
+            self.wake.wait(self.check_every)
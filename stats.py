@@ -0,0 +1,68 @@
+import pandas as pd
+
+from instrument import METRICS
+
+
+# Everything the statistics section shows, computed in one go per dataset snapshot so the app
+# can cache it (keyed on the snapshot) and a click on the button only draws. Month aggregates
+# are one groupby over (month, day) columns instead of a Python callback per month.
+# Like valuation.py this never imports Streamlit or matplotlib
+
+
+def wall_time(dates):
+    # UTC wall clock without the timezone, so months and days come out without warnings
+    dates = pd.to_datetime(dates)
+    return dates.dt.tz_convert('UTC').dt.tz_localize(None) if dates.dt.tz is not None else dates
+
+
+@METRICS.timed('stats_posts')
+def post_stats(posts):
+    dates = wall_time(posts['Date'])
+    by_month = pd.DataFrame({
+        'Month': dates.dt.to_period('M'),
+        'Day': dates.dt.normalize(),
+        'Likes': posts['Likes'],
+        'Comments': posts['Comments'],
+    }).groupby('Month').agg(Posts=('Day', 'size'), Days=('Day', 'nunique'),
+                            Likes=('Likes', 'sum'), Comments=('Comments', 'sum'))
+    per_day = pd.DataFrame({
+        'Posts': by_month['Posts'] / by_month['Days'],
+        'Likes': by_month['Likes'] / by_month['Days'],
+        'Comments': by_month['Comments'] / by_month['Days'],
+    }).sort_index()  # averages per day that had a post, for every month
+
+    spaces = posts.groupby('Space_Name', observed=True).agg(Posts=('Likes', 'size'), Likes=('Likes', 'mean'),
+                                                            Comments=('Comments', 'mean'))
+    post_counts = posts['Author'].value_counts()
+    post_counts = post_counts[post_counts > 0]  # a categorical also counts the names nobody posts under any more
+    biggest_space = spaces['Posts'].idxmax() if len(spaces) else None
+    return {
+        'posts': len(posts),
+        'posters': len(post_counts),
+        'top_poster': post_counts.index[0] if len(post_counts) else None,
+        'top_poster_posts': int(post_counts.iloc[0]) if len(post_counts) else 0,
+        'biggest_space': biggest_space,
+        'biggest_space_posts': int(spaces['Posts'].max()) if len(spaces) else 0,
+        'post_types': posts['Post_Type'].value_counts(),
+        'per_day': per_day,
+        'space_likes': spaces['Likes'].round().sort_values(ascending=False).head(5),
+        'space_comments': spaces['Comments'].round().sort_values(ascending=False).head(5),
+    }
+
+
+@METRICS.timed('stats_events')
+def event_stats(events, recent=10):
+    if len(events) == 0:
+        return {'events': 0}
+    dates = wall_time(events['Date'])
+    biggest = events['Attendees'].idxmax()
+    per_month = dates.dt.to_period('M').rename('YearMonth').value_counts().sort_index()
+    latest = dates.sort_values(ascending=False).index[:recent]
+    return {
+        'events': len(events),
+        'avg_attendees': round(events['Attendees'].mean()),
+        'biggest_event': events.loc[biggest, 'Event_Title'],
+        'biggest_event_count': events.loc[biggest, 'Attendees'],
+        'per_month': per_month.rename('Event_Count').reset_index(),
+        'recent': events.loc[latest, ['Attendees']].assign(Date=dates[latest]).sort_values(by='Date'),
+    }
@@ -0,0 +1,117 @@
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+# Local Parquet store so the posts/events survive restarts and redeploys.
+# Layout: STORE_DIR/<community>/<name>.parquet, the schema version and any extra
+# info (sync cursors, last sync time) live in the Parquet file metadata
+STORE_DIR = Path(os.environ.get("CIRCLE_STORE_DIR", ".data"))
+SCHEMA_VERSION = 4
+META_KEY = b'circle_store'
+
+
+def store_path(community, name):
+    return STORE_DIR / community / f"{name}.parquet"
+
+
+def save_frame(community, name, df, meta=None):
+    # write to a temp file first and then swap it in, so a crash never leaves half a file
+    path = store_path(community, name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    info = {'schema_version': SCHEMA_VERSION, 'meta': meta or {}}
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), META_KEY: json.dumps(info)})
+    tmp = path.with_suffix('.parquet.tmp')
+    pq.write_table(table, tmp)
+    os.replace(tmp, path)
+
+
+def load_frame(community, name):
+    # returns (df, meta), or (None, None) when there is nothing usable on disk
+    # (missing file, old schema version or a broken file all mean "pull it again")
+    path = store_path(community, name)
+    if not path.exists():
+        return None, None
+    try:
+        table = pq.read_table(path, memory_map=True)
+        info = json.loads(table.schema.metadata[META_KEY])
+    except (OSError, KeyError, ValueError, pa.ArrowException):
+        return None, None
+    if info.get('schema_version') != SCHEMA_VERSION:
+        return None, None
+    return table.to_pandas(), info['meta']
+
+
+# Checkpoints for a posts sync that is still running: every finished page of a space is
+# appended as one JSON line to STORE_DIR/<community>/checkpoint/<space_id>.jsonl, and a
+# {"done": true} line closes a finished space. A retry with the same base (the sync it builds
+# on) resumes from there, anything else starts over
+CHECKPOINT_MAX_AGE = 24 * 60 * 60  # seconds
+
+
+def checkpoint_dir(community):
+    return STORE_DIR / community / 'checkpoint'
+
+
+def clear_checkpoint(community):
+    shutil.rmtree(checkpoint_dir(community), ignore_errors=True)
+
+
+class PageCheckpoint:
+    def __init__(self, community, base=None):
+        self.path = checkpoint_dir(community)
+        self.base = base
+        self.spaces = {}  # space_id -> {'pages': [page, ...], 'done': bool}
+        if not self.load():
+            clear_checkpoint(community)
+            self.path.mkdir(parents=True, exist_ok=True)
+            info = {'schema_version': SCHEMA_VERSION, 'base': base, 'started': time.time()}
+            (self.path / 'meta.json').write_text(json.dumps(info))
+
+    def load(self):
+        # True when there is a usable checkpoint of the same sync on disk
+        try:
+            info = json.loads((self.path / 'meta.json').read_text())
+        except (OSError, ValueError):
+            return False
+        if info.get('schema_version') != SCHEMA_VERSION or info.get('base') != self.base \
+                or time.time() - info.get('started', 0) > CHECKPOINT_MAX_AGE:
+            return False
+        for file in self.path.glob('*.jsonl'):
+            space = {'pages': [], 'done': False}
+            with open(file) as lines:
+                for line in lines:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # half written line from a crash, the page gets pulled again
+                    if entry.get('done'):
+                        space['done'] = True
+                    else:
+                        space['pages'].append(entry['page'])
+            self.spaces[int(file.stem)] = space
+        return True
+
+    def pages(self, space_id):
+        return self.spaces.get(space_id, {}).get('pages', [])
+
+    def done(self, space_id):
+        return self.spaces.get(space_id, {}).get('done', False)
+
+    def add_page(self, space_id, page):
+        # one thread per space, so every file only ever has one writer
+        self.append(space_id, {'page': page})
+
+    def finish(self, space_id):
+        self.append(space_id, {'done': True})
+
+    def append(self, space_id, entry):
+        with open(self.path / f"{space_id}.jsonl", 'a') as file:
+            file.write(json.dumps(entry) + '\n')
+            file.flush()
@@ -1,467 +1,288 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import requests
 # import datetime as dt
-from datetime import datetime
-from dateutil.relativedelta import relativedelta
-import matplotlib.pyplot as plt
-import time
+import functools
+import os
 import warnings
+from concurrent.futures import ThreadPoolExecutor, wait
+from instrument import METRICS  # standard library only
 warnings.filterwarnings("ignore")
+# the data layer (pandas, numpy, requests, pyarrow) is imported further down, once the intro and
+# the token boxes are on the page. The functions below only use it when they are called
 
 
 
 # Declare my functions ------------------------------
 
-@st.cache_data(ttl='1h')
+def tracked(cache, **options):
+    # st.cache_data / st.cache_resource that also counts every call and every miss for the
+    # diagnostics (the function body only runs on a miss), hits = calls - misses
+    def decorate(fn):
+        @functools.wraps(fn)
+        def fill(*args, **kwargs):
+            METRICS.count(f"cache_miss.{fn.__name__}")
+            with METRICS.phase(f"cache_fill.{fn.__name__}"):
+                return fn(*args, **kwargs)
+        cached = cache(**options)(fill)
+        @functools.wraps(fn)
+        def call(*args, **kwargs):
+            METRICS.count(f"cache_call.{fn.__name__}")
+            return cached(*args, **kwargs)
+        call.clear = cached.clear
+        return call
+    return decorate
+
+@tracked(st.cache_data, ttl='1h')
 def get_access_token(first_token, email):
-    url = "https://app.circle.so/api/v1/headless/auth_token" 
-    headers = {"Authorization": "Bearer " + first_token}
-    data = {"email": email}
-    response = requests.post(url, headers=headers, json=data)
-    if response.status_code != 200:
-        return 1 #a BAD EMAIL OR TOKEN
-    return str("Bearer " + pd.json_normalize(response.json())['access_token'].iloc[0])
-
-# get space IDs (maybe later have an option to display these??)
-@st.cache_data(ttl='1h')
-def get_space_ids(access_token):
-    url = "https://app.circle.so/api/headless/v1/spaces"
-    headers = {'Authorization': access_token}
-    response = requests.get(url, headers=headers)
-    data = response.json()
-    df = pd.json_normalize(data)
-    return df[['id', 'name', 'space_type']]
-
-@st.cache_data(ttl='1d')
-def pull_all_posts(access_token):
-    space_id_df = get_space_ids(access_token)
-    master_list = pd.DataFrame(columns=['post_type', 'space_type', 'display_title', 'comment_count', 
-                                        'user_likes_count', 'created_at', 'author.name', 'space.name', 
-                                        'author.roles', 'author.id', 'id'])
-    for space_id in space_id_df['id']:
-        base_url = f"https://app.circle.so/api/headless/v1/spaces/{space_id}/posts?sort=latest&per_page=100&page="
-        headers = {'Authorization': access_token}
-        df_all = pd.DataFrame()
-        page = 1  # Start with page 1
-        while True:
-            url = base_url + str(page)
-            response = requests.get(url, headers=headers)
-            data = response.json()
-            if not data.get('records'):
-                break
-            records = data['records']
-            df = pd.json_normalize(records)
-            df = df[[
-                'post_type', 'display_title', 'comment_count', 'user_likes_count', 
-                'created_at', 'author.name', 'space.name', 'author.roles', 'author.id', 'id'
-            ]]
-            df_all = pd.concat([df_all, df], ignore_index=True)
-            if not data.get("has_next_page", False):
-                break
-            page += 1
-            time.sleep(.25)  # To avoid hitting rate limits
-        master_list = pd.concat([master_list, df_all], ignore_index=True)
-        
-    master_list['created_at'] = pd.to_datetime(master_list['created_at'], errors='coerce')
-    master_list = master_list[master_list['post_type'] != "event"]
-    #RENAME columns here:
-    master_list = master_list.rename(columns={
-        'display_title': 'Title',
-        'author.name': 'Author',
-        'comment_count': 'Comments',
-        'user_likes_count': 'Likes',
-        'created_at': 'Date',
-        'space.name': 'Space_Name',
-        'post_type': 'Post_Type',
-        'author.roles': 'Author_Roles',
-        'author.id':'Author_ID',
-        'id':'Post_ID'
-    })
-    master_list.sort_values(by='Date', ascending=False, inplace=True)
-    master_list['Post_ID'] = master_list['Post_ID'].astype('Int64')  # 'Int64' handles NaN values as well
-    master_list['Author_ID'] = master_list['Author_ID'].astype('Int64')
-    return master_list[['Title', 'Author', 'Date', 'Likes', 'Comments', 'Post_Type', 'Space_Name', 'Author_Roles', 'Author_ID', 'Post_ID']]
-
-@st.cache_data(ttl='1d')
-def pull_all_events(access_token):
-    url = "https://app.circle.so/api/headless/v1/community_events?per_page=100&past_events=True"
-    headers = {'Authorization': access_token}
-    response = requests.get(url, headers=headers)
-    data = response.json()
-    records = data['records']
-    event_df = pd.json_normalize(records)
-    event_df = event_df[~event_df['space.name'].str.contains('Moderator Training Space', na=False)]
-    filt = event_df[['name','event_attendees.count', 'created_at', 'comment_count', 'user_likes_count',  
-      'author.name', 'event_setting_attributes.duration_in_seconds', 'space.name', 'author.roles',
-      'id', 'author.id']]
-
-    filt = filt.rename(columns={
-        'name': 'Event_Title',
-        'event_attendees.count': 'Attendees',
-        'created_at': 'Date',
-        'comment_count': 'Comments',
-        'user_likes_count': 'Likes',
-        'author.name': 'Author',
-        'event_setting_attributes.duration_in_seconds': 'Length_Minutes',
-        'space.name': 'Space_Name',
-        'author.roles':'Author_Roles',
-        'author.id': 'Author_ID',
-        'id':'Post_ID'
-    })
-
-    # Format the 'Date' column to show only 'YYYY-MM-DD'
-    filt['Date'] = pd.to_datetime(filt['Date']).dt.strftime('%Y-%m-%d')
-
-    # Convert 'Length.Minutes' from seconds to minutes (if needed)
-    filt['Length_Minutes'] = filt['Length_Minutes'] / 60
-
-    # Optional: Round the 'Length.Minutes' to a specific decimal place
-    filt['Length_Minutes'] = filt['Length_Minutes'].round(1)
-    filt['Post_ID'] = filt['Post_ID'].astype('Int64')  # 'Int64' handles NaN values as well
-    filt['Author_ID'] = filt['Author_ID'].astype('Int64')
-    return filt[['Event_Title', 'Attendees', 'Author', 'Date', 'Likes', 'Comments', 'Length_Minutes', 'Space_Name', 'Author_Roles', 'Author_ID', 'Post_ID']]
+    return request_access_token(first_token, email)
+
+@st.cache_resource
+def post_sync_states():
+    # community -> result of its last sync_posts, shared by every session so a refresh is incremental
+    return {}
+
+@st.cache_resource
+def event_states():
+    # community -> the latest complete events frame
+    return {}
+
+@st.cache_resource
+def member_counts():
+    # community -> its member count, read again with every background refresh
+    return {}
+
+def member_count_of(access_token, community):
+    # only the first rerun that shows a community asks the API, after that the refresher keeps it current
+    counts = member_counts()
+    if community not in counts:
+        counts[community] = get_member_count(access_token)
+    return counts[community]
+
+def refresh_posts(access_token, community, state=None, progress=None):
+    # pulls, saves and then swaps the new state in with ONE assignment, readers see the old or the new snapshot
+    state = sync_and_save(access_token, community, state, progress)
+    post_sync_states()[community] = state
+    return state
+
+def refresh_community(community, credentials):
+    # runs on the refresher thread, posts first (they are what most buttons read) and then events
+    access_token = request_access_token(*credentials)
+    if access_token == 1:
+        raise RuntimeError("the headless token or email stopped working")
+    refresh_posts(access_token, community, stored_post_state(community))
+    event_states()[community] = pull_events(access_token, community, max_age=pd.Timedelta(0))
+    member_counts()[community] = get_member_count(access_token)
+
+def stored_post_state(community):
+    # the snapshot in memory, or the on-disk store after a restart (then kept in memory), or None
+    states = post_sync_states()
+    state = states.get(community)
+    if state is None and community is not None:
+        state = load_post_state(community)
+        if state is not None:
+            state = states.setdefault(community, tag_snapshot(state, community))
+    return state
+
+def synced_at(community):
+    state = stored_post_state(community)
+    return state['synced_at'].timestamp() if state is not None else None
+
+@st.cache_resource
+def refresher():
+    # the one background worker of this server process
+    return Refresher(refresh_community, synced_at)
+
+def progress_bar(text):
+    bar = st.progress(0.0, text=text)
+    def show(spaces_done, space_count, pages_done):
+        bar.progress(spaces_done / max(space_count, 1),
+                     text=f"{text} {spaces_done} of {space_count} spaces, {pages_done} pages done")
+    return bar, show
+
+def current_post_state(access_token, community=None):
+    # the snapshot in memory, then the on-disk store. The background refresher keeps both fresh,
+    # so the API is only used here when this community has never been pulled at all
+    state = stored_post_state(community)
+    if state is not None:
+        return state
+    if community is None:
+        return tag_snapshot(sync_posts(access_token), community)
+    with refresher().lock_for(community):  # the refresher may be doing the first pull right now
+        state = stored_post_state(community)
+        if state is None:
+            bar, show = progress_bar("Pulling posts for the first time:")
+            state = refresh_posts(access_token, community, progress=show)
+            bar.empty()
+    return state
+
+# no TTL on these any more: every call returns the latest snapshot the refresher swapped in.
+# They are the SAME frames for every rerun and session, so everything that reads them must
+# leave them unchanged
+def pull_all_posts(access_token, community=None):
+    return current_post_state(access_token, community)['posts']
+
+def pull_authors(access_token, community=None):
+    # the authors dimension table: one row per Author_ID with the latest name, roles and Role_Mask
+    return current_post_state(access_token, community)['authors']
+
+def pull_all_events(access_token, community=None):
+    events = event_states().get(community)
+    if events is None:
+        events = pull_events(access_token, community)
+        if community is not None:
+            event_states()[community] = events
+    return events
+
+def show_events_progressively(access_token, community, render):
+    # calls render(events) in the same spot after every page, returns the complete events frame
+    # (once the events are in memory that is a single render)
+    placeholder = st.empty()
+    events = event_states().get(community)
+    if events is not None:
+        with placeholder.container():
+            render(events)
+        return events
+    for events in stream_all_events(access_token, community):
+        with placeholder.container():
+            render(events)
+    if community is not None:
+        event_states()[community] = events
+    return events
+
+def pull_communities(rows):
+    # name,token,email rows -> ({name: posts}, {name: events}). Every community that isn't in memory
+    # yet is pulled at the same time (under one shared request budget), so the wait is about as long
+    # as the slowest community instead of all of them added up. Streamlit is only touched from here,
+    # the worker threads just pull and swap the results into the shared dicts
+    states, all_events, worker = post_sync_states(), event_states(), refresher()
+    budget = TokenBucket(GLOBAL_REQUESTS_PER_SECOND)
+    communities = {}
+    for row in rows:
+        access_token = get_access_token(row['token'], row['email'])
+        if access_token == 1:
+            st.toast(f"Bad token or email for {row['name']}, it is left out.")
+            continue
+        community = community_key(row['token'])
+        worker.register(community, (row['token'], row['email']))
+        stored_post_state(community)  # the on-disk store counts as pulled
+        communities[row['name']] = (access_token, community)
+
+    def pull(access_token, community):
+        with worker.lock_for(community):
+            if community not in states:
+                states[community] = sync_and_save(access_token, community, budget=budget)
+            if community not in all_events:
+                all_events[community] = pull_events(access_token, community, budget=budget)
+
+    missing = [name for name, (_, community) in communities.items()
+               if community not in states or community not in all_events]
+    if missing:
+        bar = st.progress(0.0, text=f"Pulling {len(missing)} communities...")
+        with ThreadPoolExecutor(max_workers=len(missing)) as pool:
+            pending = {pool.submit(pull, *communities[name]) for name in missing}
+            futures = list(pending)
+            while pending:
+                _, pending = wait(pending, timeout=0.5)
+                done = len(missing) - len(pending)
+                bar.progress(done / len(missing), text=f"Pulled {done} of {len(missing)} communities")
+            for future in futures:
+                future.result()
+        bar.empty()
+    return ({name: states[community]['posts'] for name, (_, community) in communities.items()},
+            {name: all_events[community] for name, (_, community) in communities.items()})
+
+def data_age(community):
+    # "posts synced 12 minutes ago" style note for the page, plus the last background error
+    status = refresher().status(community)
+    if status is None or status['age'] is None:
+        return None
+    note = f"Data last synced {round(status['age'] / 60)} minutes ago, it refreshes in the background."
+    if status['error']:
+        note += f" The last background refresh failed ({status['error']}), showing the older data."
+    return note
         
-def filter_events(df, weights, top_number=5):
-    df['Worth'] = (df['Likes'] * weights['like']) + \
-        (df['Comments'] * weights['comment']) + \
-        (df['Attendees'] * weights['attendees']) + \
-        (df['Length_Minutes'] * weights['duration'])
-    df.sort_values(by="Worth", ascending=False, inplace=True)
-    df.reset_index(inplace=True)
-    return df[['Event_Title', 'Worth', 'Attendees', 'Likes', 'Comments', 'Length_Minutes', 'Date', 'Author', 'Author_Roles']].head(top_number)
-
-
-def pull_most_valuable_people(df, top_number, weights, month=True, specific_date='', 
-                              filter_admins=False, filter_mods=False, amount=0):
-    if filter_admins:
-        df = df[~df['Author_Roles'].apply(lambda x: 'admin' in x)]
-        df = df[~df['Author'].str.contains('admin', case=False, na=False)]
-    
-    if filter_mods:
-        df = df[~df['Author_Roles'].apply(lambda x: 'moderator' in x)]
-
-
-    # MONTH STUFF
-    current_year = datetime.now().year
-    current_month = datetime.now().month
-
-    #if 0, then for ALL TIME
-    if month == 1: # for current month
-        df = df.loc[(df['Date'].dt.year == current_year) & (df['Date'].dt.month == current_month)]
-    elif month == 2:# for LAST MONTH
-        last_month_date = datetime.now() - relativedelta(months=1)
-        last_month_year = last_month_date.year
-        last_month = last_month_date.month
-        df = df.loc[(df['Date'].dt.year == last_month_year) & (df['Date'].dt.month == last_month)]
-    elif month == 3: #for a specific date
-        specific_date = datetime.strptime(str(specific_date), '%Y-%m-%d')
-        if specific_date > datetime.now() and specific_date.month != datetime.now().month:
-            st.toast("Please choose a date in the PAST, not the future.")
-        df = df.loc[(df['Date'].dt.year == specific_date.year) & (df['Date'].dt.month == specific_date.month)]
-    # elif month == 4: for a different time range?
-
-    df['post_type_weight'] = df['Post_Type'].map(weights)
-    df.loc[:, 'Worth'] = (df['Likes'] * weights['like']) + \
-                     (df['Comments'] * weights['comment']) + \
-                     (df['post_type_weight'] * 10)
-
-    user_worth_df = df.groupby('Author', as_index=False).agg({'Worth': 'sum'})
-    # user_worth_df = df.groupby(['Author', 'Author_ID'], as_index=False).agg({'Worth': 'sum'})
-    user_worth_df.sort_values(by='Worth', ascending=False, inplace=True)
-
-    #check HERE if there is enough people to return the full number
-    if len(user_worth_df) < top_number:
-        st.toast("There were not enough people who posted in this time period to fulfill your request. Please choose a different period or fewer people.")
-
-    shortened = user_worth_df.head(top_number)
-    total_worth = shortened['Worth'].sum()
-    user_worth_df.loc[:, 'Worth_Percentage'] = (user_worth_df['Worth'] / total_worth * 100)
-    user_worth_df = user_worth_df.sort_values(by='Worth', ascending=False)
-    user_worth_df = user_worth_df.reset_index(drop=True)
-
-    if amount != 0:
-        df = pd.DataFrame(user_worth_df)
-        df['payment_amount'] = (df['Worth_Percentage'] / 100) * amount
-        df['Rounded_Payment'] = np.floor(df['payment_amount'] * 100) / 100  # Round down
-        difference = round(amount - df['Rounded_Payment'].sum(), 2)
-        df['fraction'] = df['payment_amount'] - df['Rounded_Payment']
-        df = df.sort_values(by='fraction', ascending=False)
-        for i in range(int(difference * 100)):
-            df.iloc[i, df.columns.get_loc('Rounded_Payment')] += 0.01
-        df = df.drop(columns=['fraction', 'payment_amount'])
-        df.sort_values(by='Rounded_Payment', ascending=False, inplace=True)
-        df.reset_index(drop=True, inplace=True)
-        return df.head(top_number)
-        
-    return user_worth_df.head(top_number)
-
-def pull_most_valuable_posts(df, top_number, weights, month=0, specific_date='',
-                              filter_admins=False, filter_mods=False): #space_name="All",
-    # maybe add that you can filter by a specific SPACE ---> would need to SHOW the space names somewhere...
-    #like have a dropdown of all the space names...? might lead to more problems idk
-    # if month == 0: # do nothing
-
-    if filter_admins:
-        df = df[~df['Author_Roles'].apply(lambda x: 'admin' in x)]
-        df = df[~df['Author'].str.contains('admin', case=False, na=False)]
-    
-    if filter_mods:
-        df = df[~df['Author_Roles'].apply(lambda x: 'moderator' in x)]
-
-    # MONTH STUFF
-    current_year = datetime.now().year
-    current_month = datetime.now().month
-
-    #if 0, then for ALL TIME
-    if month == 1: # for current month
-        df = df.loc[(df['Date'].dt.year == current_year) & (df['Date'].dt.month == current_month)]
-    elif month == 2:# for LAST MONTH
-        last_month_date = datetime.now() - relativedelta(months=1)
-        last_month_year = last_month_date.year
-        last_month = last_month_date.month
-        df = df.loc[(df['Date'].dt.year == last_month_year) & (df['Date'].dt.month == last_month)]
-    elif month == 3: #for a specific date
-        specific_date = datetime.strptime(str(specific_date), '%Y-%m-%d')
-        if specific_date > datetime.now() and specific_date.month != datetime.now().month:
-            st.toast("Please choose a date in the PAST, not the future.")
-        df = df.loc[(df['Date'].dt.year == specific_date.year) & (df['Date'].dt.month == specific_date.month)]
-
-
-        #after filtering to the right dates, now check how many posts there are --- if not enough, send a TOAST up and return early
-    #ACTUALLY THIS IS FOR THE POSTS, NOT THE PEOPLE PULLER
-    if len(df) < top_number:
-        st.toast(f"There are only {len(df)} posts from that time period. Please choose a different period or fewer posts.")
-    
-    df['post_type_weight'] = df['Post_Type'].map(weights)
-    df['Worth'] = (df['Likes'] * weights['like']) + \
-              (df['Comments'] * weights['comment']) + \
-              (df['post_type_weight'] * 10)
-
-    df.sort_values(by='Worth', ascending=False, inplace=True)
-    shortened = df.head(top_number)
-    total_worth = shortened['Worth'].sum()
-    shortened.loc[:, 'Worth_Percentage'] = (shortened['Worth'] / total_worth * 100)
-    shortened = shortened.reset_index(drop=True)
-    shortened['Date'] = pd.to_datetime(shortened['Date']).dt.strftime('%Y-%m-%d')
-    return shortened[['Title', 'Author', 'Worth', 'Worth_Percentage', 'Comments', 'Likes', 'Date', 'Post_ID']]
-
-    # month == 0 --> don't filter anything
-    # month == 1 --> filter to this current month so far
-    # month == 2 XX other specific month, get the others working first
-    # month == 3 XX other range,,,,,,,
-
-
-
-def exclude_people(df, excluded_list, exclude=True):
-    # Split the excluded_list string into a list of names (handle spaces and remove empty names)
-    excluded_names = [name.strip().lower() for name in excluded_list.split(',') if name.strip()]
-    
-    # Normalize the 'Author' column to lowercase for comparison
-    df['Author_normalized'] = df['Author'].str.lower()
-    
-    # Check for names in excluded_names that are not in the DataFrame
-    invalid_names = [name for name in excluded_names if name not in df['Author_normalized'].unique()]
-    
-    # Create an alert for invalid names
-    if invalid_names:
-        st.toast(f"Invalid name(s): {', '.join(invalid_names)}")
-
-    # Filter the DataFrame based on exclude flag
-    if exclude:
-        filtered_df = df[~df['Author_normalized'].isin(excluded_names)]
+@tracked(st.cache_resource, max_entries=20)
+def snapshot_rollup(snapshot, _posts):
+    # keyed on the snapshot only (the frame itself is not hashed)
+    return build_rollup(_posts)
+
+def pull_post_rollup(access_token, community=None):
+    # built once per posts snapshot, every people query after that only touches the cube
+    posts = pull_all_posts(access_token, community)
+    return snapshot_rollup(posts.attrs.get('snapshot'), posts)
+
+# read only, so it is shared between sessions instead of copied. The snapshot is part of the
+# key so a refreshed frame always gets a fresh index
+@tracked(st.cache_resource, ttl='1h', max_entries=20)
+def pull_author_index(access_token, community=None, snapshot=None, frame='rollup'):
+    if frame == 'rollup':
+        return AuthorIndex(pull_post_rollup(access_token, community))
+    return AuthorIndex(pull_all_posts(access_token, community))
+
+# the statistics section, computed once per snapshot so clicking the button again only draws
+@tracked(st.cache_resource, max_entries=20)
+def snapshot_post_stats(snapshot, _posts):
+    return post_stats(_posts)
+
+@tracked(st.cache_resource, max_entries=20)
+def snapshot_event_stats(snapshot, _events):
+    return event_stats(_events)
+
+def pull_post_stats(access_token, community=None):
+    posts = pull_all_posts(access_token, community)
+    return snapshot_post_stats(posts.attrs.get('snapshot'), posts)
+
+def pull_event_stats(access_token, community=None):
+    events = pull_all_events(access_token, community)
+    return snapshot_event_stats(events.attrs.get('snapshot'), events)
+
+# same idea for dates: the posts sorted by Date once per snapshot, any time range after that is a binary search
+@tracked(st.cache_resource, ttl='1h', max_entries=20)
+def pull_date_index(access_token, community=None, snapshot=None):
+    return DateIndex(pull_all_posts(access_token, community))
+
+# the charts only draw, the numbers come from stats.py (cached per snapshot by pull_post_stats/pull_event_stats).
+# The PNG of every chart is cached per (snapshot, chart) too, so a repeat click doesn't touch matplotlib
+@tracked(st.cache_data, max_entries=60)
+def rendered_chart(snapshot, chart, _data):
+    return render_png(chart, _data)
+
+def cache_table(counters):
+    # one row per tracked cache: calls, misses and the hit rate
+    names = sorted({name.split('.', 1)[1] for name in counters if name.startswith('cache_call.')})
+    calls = [counters.get(f"cache_call.{name}", 0) for name in names]
+    misses = [counters.get(f"cache_miss.{name}", 0) for name in names]
+    return pd.DataFrame({'Cache': names, 'Calls': calls, 'Misses': misses,
+                         'Hit_Rate': [round((c - m) / c * 100, 1) if c else None for c, m in zip(calls, misses)]})
+
+def show_diagnostics():
+    # the admin panel: where the time went in this server process, plus JSON / Prometheus text to save
+    data = METRICS.snapshot()
+    with st.expander("Diagnostics"):
+        st.caption(f"Since this server process started {round(data['uptime'] / 60)} minutes ago, for every session.")
+        phases = pd.DataFrame.from_dict(data['phases'], orient='index')
+        if len(phases):
+            phases['avg'] = phases['seconds'] / phases['calls']
+            st.write("**Time per phase (seconds)**")
+            st.dataframe(phases.sort_values('seconds', ascending=False).round(4))
+        st.write("**API requests**")
+        st.dataframe(pd.DataFrame([data['api']]).round(4), hide_index=True)
+        st.write("**Caches**")
+        st.dataframe(cache_table(data['counters']), hide_index=True)
+        if data['values']:
+            st.write("**Frame sizes**")
+            st.dataframe(pd.Series(data['values'], name='value'))
+        st.download_button("Download as JSON", METRICS.to_json(), file_name='diagnostics.json', mime='application/json')
+        st.download_button("Download as Prometheus text", METRICS.to_prometheus(), file_name='diagnostics.prom', mime='text/plain')
+
+def show_chart(chart, data, snapshot, native=False):
+    if native:  # Streamlit's own chart from the numbers, no matplotlib at all
+        title, frame = chart_data(chart, data)
+        st.write(f"**{title}**")
+        st.bar_chart(frame, color=[GOLD, GREY][:len(frame.columns)])
+    elif snapshot is None:
+        st.image(render_png(chart, data))
     else:
-        filtered_df = df[df['Author_normalized'].isin(excluded_names)]
-    
-    # Drop the temporary normalized column before returning
-    filtered_df = filtered_df.drop(columns=['Author_normalized'])
-    
-    return filtered_df
-
-        
-def get_member_count(atoken):
-    url = "https://app.circle.so/api/headless/v1/community_members"
-    headers = {"Authorization": atoken}
-    params = {
-        "page":1,
-        "per_page":1
-    }
-    response = requests.get(url, headers=headers, params=params)
-    return response.json().get('count')
-
-
-def plot_events(df):
-
-    df['Date'] = pd.to_datetime(events['Date'])
-    recent_events = df.sort_values(by='Date', ascending=False)
-    top_10_events = recent_events.head(10).sort_values(by='Date', ascending=True)
-    x = top_10_events['Date'].dt.strftime('%Y-%m-%d')
-    y = top_10_events['Attendees']
-    plt.figure(figsize=(10, 6))
-    bars = plt.bar(x, y, color='#D0BA71', label='Attendees')
-    # plt.plot(x, y, color='red', marker='o', linestyle='-', linewidth=2, label='Trend Line')
-    for bar in bars:
-        height = bar.get_height()
-        plt.text(
-            bar.get_x() + bar.get_width() / 2,  # X-coordinate: Center of the bar
-            height + 50,  # Y-coordinate: Slightly above the bar
-            f'{int(height)}',  # Text to display (convert height to integer)
-            ha='center',  # Center-align the text
-            va='bottom',  # Bottom of the text aligns with the Y-coordinate
-            fontsize=9,
-            color='black'
-        )
-
-    plt.title(f'Number of Attendees for the {len(top_10_events)} Most Recent Events', fontsize=18)
-    plt.xlabel('Event Date')
-    plt.ylabel('Number of Attendees')
-    plt.xticks(rotation=45, ha="right")
-    # plt.legend()
-    plt.tight_layout()
-    st.pyplot(plt)
-
-def plot_post_type(df):
-    # Count the occurrences of each post type
-    post_type_counts = df['Post_Type'].value_counts()
-    
-    # Create a mapping for labels
-    label_mapping = {'basic': 'Text', 'image': 'Image'}
-    
-    # Map the labels
-    mapped_labels = [label_mapping.get(label, label) for label in post_type_counts.index]
-    
-    # Plot the pie chart
-    plt.figure(figsize=(4, 4))
-    plt.pie(post_type_counts, labels=mapped_labels, autopct='%1.1f%%', colors=['#D0BA71', '#E8E8E8'], startangle=180)
-    plt.title('Distribution of Post Types')
-    st.pyplot(plt)
-
-def plot_posts_per_day(df):
-    df['Date'] = pd.to_datetime(df['Date'])
-    df['Year_Month'] = df['Date'].dt.to_period('M')
-    posts_per_month_day = df.groupby(df['Year_Month']).apply(lambda x: x['Date'].dt.date.nunique())
-    posts_per_month = df.groupby('Year_Month').size()
-    avg_posts_per_day_by_month = posts_per_month / posts_per_month_day
-    avg_posts_per_day_by_month = avg_posts_per_day_by_month.sort_index()
-    plt.figure(figsize=(10, 6))
-    avg_posts_per_day_by_month.plot(kind='bar', color='#D0BA71')
-    plt.title('Average Number of Posts Per Day by Month', fontsize=18)
-    plt.xlabel('Month', fontsize=14)
-    plt.ylabel('Average Posts per Day', fontsize=14)
-    plt.xticks(rotation=45, ha='right')
-    for i, v in enumerate(avg_posts_per_day_by_month):
-        plt.text(i, v + 0.05, f'{round(v):.0f}', ha='center', va='bottom', fontsize=10)
-    plt.tight_layout()
-    st.pyplot(plt)
-
-def plot_likes_comments_per_day(df):
-    # Ensure the Date is in datetime format
-    df['Date'] = pd.to_datetime(df['Date'])
-    df['Year_Month'] = df['Date'].dt.to_period('M')
-    
-    # Calculate total likes and comments per month
-    total_likes_per_month = df.groupby('Year_Month')['Likes'].sum()  # Sum of likes in the month
-    total_comments_per_month = df.groupby('Year_Month')['Comments'].sum()  # Sum of comments in the month
-    
-    # Calculate the number of unique days per month (same as before)
-    posts_per_month_day = df.groupby(df['Year_Month']).apply(lambda x: x['Date'].dt.date.nunique())
-    
-    # Calculate average likes per day
-    avg_likes_per_day_by_month = total_likes_per_month / posts_per_month_day
-    avg_likes_per_day_by_month = avg_likes_per_day_by_month.sort_index()
-    
-    # Calculate average comments per day
-    avg_comments_per_day_by_month = total_comments_per_month / posts_per_month_day
-    avg_comments_per_day_by_month = avg_comments_per_day_by_month.sort_index()
-
-    # Plotting likes and comments side by side
-    fig, ax = plt.subplots(figsize=(12, 6))
-
-    # Plot the bars for likes
-    avg_likes_per_day_by_month.plot(kind='bar', color='#D0BA71', width=0.4, label='Avg Likes Per Day', ax=ax, position=1)
-    
-    # Plot the bars for comments (with adjusted width and position)
-    avg_comments_per_day_by_month.plot(kind='bar', color='#E8E8E8', width=0.4, label='Avg Comments Per Day', ax=ax, position=0)
-    
-    # Titles and labels
-    plt.title('Average Likes and Comments Per Day by Month', fontsize=18)
-    plt.xlabel('Month', fontsize=14)
-    plt.ylabel('Average Per Day', fontsize=14)
-    plt.xticks(rotation=45, ha='right')
-    plt.legend(fontsize=14)
-
-    # Annotate the bars with the values
-    for i, v in enumerate(avg_likes_per_day_by_month):
-        plt.text(i, v + 0.05, f'{round(v):.0f}', ha='right', va='bottom', fontsize=9)
-    
-    for i, v in enumerate(avg_comments_per_day_by_month):
-        plt.text(i, v + 0.05, f'{round(v):.0f}', ha='left', va='bottom', fontsize=9)
-    
-    plt.tight_layout()
-    st.pyplot(plt)
-
-
-
-def plot_top_5_likes(df):
-    # """
-    # Generates a bar chart of the top 5 spaces with the highest average likes.
-    # """
-    # Group by 'Space_Name' and calculate the average of 'Likes'
-    average_likes = df.groupby('Space_Name')['Likes'].mean().round()
-    
-    # Sort by 'Likes' in descending order and take the top 5
-    top_5_spaces_likes = average_likes.sort_values(ascending=False).head(5)
-    
-    # Plot for Likes
-    plt.figure(figsize=(8, 6))
-    bars = top_5_spaces_likes.plot(kind='bar', color='#D0BA71', width=0.8)
-    plt.title('Top 5 Spaces with Highest Average Likes', fontsize=14)
-    plt.xlabel('Space Name', fontsize=12)
-    plt.ylabel('Average Likes', fontsize=12)
-    plt.xticks(rotation=45, ha="right")
-    plt.legend(['Likes'], loc='upper right')
-
-    # Add value labels on the bars
-    # for container in bars.containers:
-    #     bars.bar_label(container, label_type='edge', padding=3, fontsize=10)
-        # Add value labels on the bars
-    for i, v in enumerate(top_5_spaces_likes):
-        plt.text(i, v + 0.5, str(int(v)), ha='center', va='bottom', fontsize=10)
-
-    plt.tight_layout()
-    st.pyplot(plt)
-
-
-def plot_top_5_comments(df):
-    # """
-    # Generates a bar chart of the top 5 spaces with the highest average comments.
-    # """
-    # Group by 'Space_Name' and calculate the average of 'Comments'
-    average_comments = df.groupby('Space_Name')['Comments'].mean().round()
-    
-    # Sort by 'Comments' in descending order and take the top 5
-    top_5_spaces_comments = average_comments.sort_values(ascending=False).head(5)
-    
-    # Plot for Comments
-    plt.figure(figsize=(8, 6))
-    bars = top_5_spaces_comments.plot(kind='bar', color='#D0BA71', width=0.8)
-    plt.title('Top 5 Spaces with Highest Average Comments', fontsize=14)
-    plt.xlabel('Space Name', fontsize=12)
-    plt.ylabel('Average Comments', fontsize=12)
-    plt.xticks(rotation=45, ha="right")
-    plt.legend(['Comments'], loc='upper right')
-
-    # Add value labels on the bars
-    # for container in bars.containers:
-    #     bars.bar_label(container, label_type='edge', padding=3, fontsize=10)
-
-     # Add value labels on the bars
-    for i, v in enumerate(top_5_spaces_comments):
-        plt.text(i, v + 0.5, str(int(v)), ha='center', va='bottom', fontsize=10)
-
-    plt.tight_layout()
-    st.pyplot(plt)
+        st.image(rendered_chart(snapshot, chart, data))
 
 
 
@@ -511,17 +332,39 @@ st.link_button("See the Random Picker site for help images on generating tokens"
 # mention that we need to get a new token every hour?????
 first_token = st.text_input("Headless Auth Token Here:", "")
 email = st.text_input("Account Email Here:", "")
+
+# a cold replica paints everything above before paying for these, after that they are in
+# sys.modules and a rerun doesn't import anything. matplotlib is only loaded by charts.render_png
+import pandas as pd
+from circle_api import GLOBAL_REQUESTS_PER_SECOND, TokenBucket, get_member_count, request_access_token
+from ingest import combine_communities
+from sync import community_key, load_post_state, parse_communities, stream_all_events, pull_events, sync_and_save, sync_posts, tag_snapshot
+from authors import AuthorIndex
+from refresher import Refresher
+from charts import GOLD, GREY, chart_data, render_png
+from stats import event_stats, post_stats
+from timeline import DateIndex, as_utc, trailing_range
+from valuation import build_rollup, compare_communities, exclude_people, excluded_mask, filter_events, pull_most_valuable_people, pull_most_valuable_posts, range_rollup, rank_by_community, top_positions, trailing_leaderboards, with_roles
+from valuation import base_overlap, sweep_people, sweep_posts, top_stability, weight_grid
+
 if first_token != "" and email != "":
     atoken = get_access_token(first_token, email)
+    community = community_key(first_token)
     if atoken == 1:
         st.error('Bad token or email, please try again')
     else:
         st.write(":white_check_mark: Good token and email, now we are ready to pull data from the APIs. Notice that the first time the posts are pulled may take a couple minutes.")
         st.write(":red[You can download any data table as a CSV by hovering over it and clicking the button that appears in the top right corner.]")
-        member_count = get_member_count(atoken)
+        member_count = member_count_of(atoken, community)
+        # from now on this community is kept warm in the background, the buttons only read memory
+        refresher().register(community, (first_token, email))
+        age_note = data_age(community)
+        if age_note is not None:
+            st.caption(age_note)
 # If the token was bad.......
 else:
     atoken = 0
+    community = None
     members = st.empty()
     event_data = st.empty()
     member_count = 0
@@ -543,9 +386,9 @@ if top_five_this_month:
     if atoken == 0 or atoken == 1:
             st.toast("Can't pull the posts with a bad token")
     else:
-        members = pull_all_posts(atoken)
+        members = pull_all_posts(atoken, community)
         try:
-            st.dataframe(pull_most_valuable_posts(members, top_number=5, weights = default_weights, month=1, filter_admins=True, filter_mods=True))
+            st.dataframe(pull_most_valuable_posts(members, top_number=5, weights = default_weights, month=1, filter_admins=True, filter_mods=True, notify=st.toast))
         except ValueError as e:
             st.error(f"There are not 5 members that fit these parameters. Please try a smaller number or choose different filters. ")
 
@@ -555,9 +398,10 @@ if top_five_all_time:
     if atoken == 0 or atoken == 1:
             st.toast("Can't pull the posts with a bad token")
     else:
-        members = pull_all_posts(atoken)
+        rollup = pull_post_rollup(atoken, community)
         try:
-            st.dataframe(pull_most_valuable_people(members, top_number=5, weights = default_weights, month=0, filter_admins=True, filter_mods=True))
+            st.dataframe(with_roles(pull_most_valuable_people(rollup, top_number=5, weights = default_weights, month=0, filter_admins=True, filter_mods=True, notify=st.toast),
+                                    pull_authors(atoken, community)))
         except ValueError as e:
             st.error(f"There are not 5 members that fit these parameters. Please try a smaller number or choose different filters. ")
 
@@ -567,25 +411,22 @@ if top_five_events:
     if atoken == 0 or atoken == 1:
             st.toast("Can't pull the posts with a bad token")
     else:
-        events = pull_all_events(atoken)
-        events.sort_values(by="Attendees", ascending=False, inplace=True)
-        events.reset_index(inplace=True)
-        st.dataframe(events[['Event_Title', 'Attendees', 'Date', 'Author']].head(5))
+        events = pull_all_events(atoken, community)
+        top = events.iloc[top_positions(events['Attendees'], 5, tiebreak=events['Post_ID'])].reset_index()
+        st.dataframe(top[['Event_Title', 'Attendees', 'Date', 'Author']])
 
 
 
-all_events = st.button("Show all events (up to 100)")
+all_events = st.button("Show all events")
 if all_events:
     if atoken == 0 or atoken == 1:
             st.toast("Can't pull the posts with a bad token")
     else:
-        events = pull_all_events(atoken)
-        events.sort_values(by="Date", ascending=False, inplace=True)
-        events.reset_index(inplace=True)
-        if len(events) > 100:
-            st.dataframe(events[['Event_Title', 'Attendees', 'Date', 'Author']].head(100))
-        else:
+        # the table fills in page by page while the rest of the events are still loading
+        def show_all(events):
+            events = events.sort_values(by="Date", ascending=False).reset_index()
             st.dataframe(events[['Event_Title', 'Attendees', 'Date', 'Author']])
+        show_events_progressively(atoken, community, show_all)
 
 
 
@@ -612,17 +453,19 @@ with st.form('search_form'):
         if atoken == 0 or atoken == 1:
             st.toast("Can't do this with a bad token")
         else:
-            members = pull_all_posts(atoken)
-            df = exclude_people(members, included_people, exclude=False)
+            rollup = pull_post_rollup(atoken, community)
+            authors = pull_author_index(atoken, community, rollup.attrs.get('snapshot'))
+            df = exclude_people(rollup, included_people, exclude=False, index=authors, notify=st.toast)
 
             #now check if there are all the people in the list?
-            pick_count = df['Author'].nunique()
+            pick_count = df['Author_ID'].nunique()  # people are Author_IDs, two members can share a name
             if pick_count < 1 or len(df) == 0:
                 st.toast("There were no valid names, please make sure to spell names exactly.")
             else:
-                st.dataframe(pull_most_valuable_people(df, pick_count,
+                st.dataframe(with_roles(pull_most_valuable_people(df, pick_count,
                                                     weights = default_weights, month=0, specific_date=" ",
-                                                    filter_admins=False, filter_mods=False, amount = payment_amount_first))
+                                                    filter_admins=False, filter_mods=False, amount = payment_amount_first,
+                                                    notify=st.toast), pull_authors(atoken, community)))
                 st.write("You can download this table as a CSV using the button in the top right corner of the table when you hover over it.")
 
 
@@ -688,12 +531,12 @@ with st.form("e_form"):
         if atoken == 0 or atoken == 1:
             st.toast("Can't pull the posts with a bad token")
         else:
-            events = pull_all_events(atoken)
+            # ranks the events pulled so far, the table updates as more pages come in
+            def show_ranking(events):
+                st.dataframe(filter_events(events, weights, min(picks_num, len(events))))
+            events = show_events_progressively(atoken, community, show_ranking)
             if picks_num > len(events):
                 st.toast(f"This community only has {len(events)} events.")
-                st.dataframe(filter_events(events, weights, len(events)))
-            else:
-                st.dataframe(filter_events(events, weights, picks_num))
             # try:
             #     st.dataframe(filter_events(events, weights, picks_num))
             # except ValueError as e:
@@ -743,7 +586,8 @@ with st.form("pp_form"):
         1: "This Month",
         2: "Last Month",
         3: "Other Specific Month",
-        # 4: "Other Time Range"
+        4: "Other Time Range",
+        5: "Rolling Window",
     }
     time_selection = st.segmented_control(
         "Choose what to pull: ",
@@ -760,6 +604,8 @@ with st.form("pp_form"):
     
     st.write("If you want a specific month, choose any day in that month.")
     opt_date = st.date_input("Choose a month", value=None)
+    opt_range = st.date_input("For a time range, choose the first and last day", value=[])
+    window_days = st.selectbox("For a rolling window, how many days back?", (7, 30, 90), index=1)
 
     
     filter_admins_check = st.checkbox("Filter out Admins", value = True)
@@ -777,6 +623,9 @@ with st.form("pp_form"):
         label = "Input a dollar amount to see the distribution between top members", 
         min_value=0, max_value=1000000, value="min"
     )
+
+    #optional - what if the weights were a bit different, every combination in one go
+    weight_spread = st.select_slider("Also check how stable the picks are when every weight changes by up to (%)", options=[0, 25, 50, 75], value=0)
     
     
     p_submit = st.form_submit_button('Submit my picks')
@@ -786,26 +635,105 @@ with st.form("pp_form"):
         if atoken == 0 or atoken == 1:
             st.toast("Can't pull the posts with a bad token")
         else:
-            members = pull_all_posts(atoken)
-            df = members
-            if excluded_people != "":
-                df = exclude_people(members, excluded_people)
+            # a time range (4) or rolling window (5) as [start, end), the end day itself is included
+            date_range = None
+            if time_selection == 4:
+                if len(opt_range) != 2:
+                    st.toast("Choose the first and last day of the time range, showing all time instead.")
+                else:
+                    date_range = (as_utc(opt_range[0]), as_utc(opt_range[1]) + pd.Timedelta(days=1))
+            elif time_selection == 5:
+                date_range = trailing_range(window_days)
+
+            # people are valued from the monthly rollup, posts need the full posts frame. A range
+            # that isn't whole months needs the posts too, cut out through the cached date index
+            frame = 'rollup' if post_or_people_selection == 0 and date_range is None else 'posts'
+            dates = None
+            if frame == 'rollup':
+                df = pull_post_rollup(atoken, community)
+            else:
+                df = pull_all_posts(atoken, community)
+                dates = pull_date_index(atoken, community, df.attrs.get('snapshot'))
+            keep = None  # the excluded people are a mask for the rankings, the shared frame isn't copied
+            if post_or_people_selection == 0 and date_range is not None:
+                df = range_rollup(df, date_range, dates)  # a small rollup of just the range
+                if excluded_people != "":
+                    keep = excluded_mask(df, excluded_people, notify=st.toast)
+            elif excluded_people != "":
+                authors = pull_author_index(atoken, community, df.attrs.get('snapshot'), frame)
+                keep = excluded_mask(df, excluded_people, index=authors, notify=st.toast)
+            month = 0 if date_range is not None else time_selection
             
             try:
                 if post_or_people_selection == 0: #PEOPLE
-                    st.dataframe(pull_most_valuable_people(df, top_number=picks, weights = weights, month=time_selection, specific_date=opt_date, filter_admins=filter_admins_check, filter_mods=filter_mods_check, amount = payment_amount))
+                    st.dataframe(with_roles(pull_most_valuable_people(df, top_number=picks, weights = weights, month=month, specific_date=opt_date, filter_admins=filter_admins_check, filter_mods=filter_mods_check, amount = payment_amount, notify=st.toast, keep=keep),
+                                            pull_authors(atoken, community)))
                 elif post_or_people_selection == 1: #POSTS
-                    st.dataframe(pull_most_valuable_posts(df, top_number=picks, weights = weights, month=time_selection, specific_date=opt_date, filter_admins=filter_admins_check, filter_mods=filter_mods_check))
+                    st.dataframe(pull_most_valuable_posts(df, top_number=picks, weights = weights, month=month, specific_date=opt_date, filter_admins=filter_admins_check, filter_mods=filter_mods_check, notify=st.toast, date_range=date_range, index=dates, keep=keep))
+
+                if weight_spread > 0:
+                    weight_sets = weight_grid(weights, spread=weight_spread / 100, steps=3)
+                    if post_or_people_selection == 0:
+                        sweep = sweep_people(df, weight_sets, picks, month=month, specific_date=opt_date, filter_admins=filter_admins_check, filter_mods=filter_mods_check, keep=keep)
+                        key = 'Author_ID'
+                    else:
+                        sweep = sweep_posts(df, weight_sets, picks, month=month, specific_date=opt_date, filter_admins=filter_admins_check, filter_mods=filter_mods_check, date_range=date_range, index=dates, keep=keep)
+                        key = 'Post_ID'
+                    overlap = base_overlap(sweep, key)
+                    st.write(f"With every weight up to {weight_spread}% higher or lower ({len(weight_sets)} combinations), "
+                             f"the picks above stay the exact same in {round((overlap == 1).mean() * 100)}% of them, "
+                             f"and on average {round(overlap.mean() * 100)}% of them are still picked.")
+                    st.dataframe(top_stability(sweep, key), hide_index=True)
             except ValueError as e:
                 st.error(f"There are not {picks} members that fit these parameters. Please try a smaller number or choose different filters. ")
 
 
 
+st.divider()
+with st.form("compare_form"):
+    st.subheader("Compare communities:")
+    st.write("Put one community per line as: a name for it, its headless token, the account email. The communities are pulled at the same time and ranked side by side with the base values from the quick buttons.")
+    compare_text = st.text_area("Communities (name, token, email)", "")
+    compare_picks = st.slider("How many people and posts per community?", 1, 20, 5)
+    compare_time = st.segmented_control(
+        "Choose what to pull: ",
+        options=[0, 1, 2],
+        format_func=lambda option: {0: "All Time", 1: "This Month", 2: "Last Month"}[option],
+        selection_mode="single",
+        default=0
+    )
+    compare_submit = st.form_submit_button('Compare them')
+    if compare_submit:
+        try:
+            rows = parse_communities(compare_text.splitlines(), header=False)
+        except ValueError as e:
+            rows = []
+            st.toast(str(e))
+        if len(rows) < 2:
+            st.toast("Please put in at least two communities to compare.")
+        else:
+            posts_by_name, events_by_name = pull_communities(rows)
+            if posts_by_name:
+                st.write("Headline numbers for each community:")
+                st.dataframe(compare_communities(combine_communities(posts_by_name),
+                                                 combine_communities(events_by_name)))
+                options = dict(top_number=compare_picks, weights=default_weights, month=compare_time,
+                               filter_admins=True, filter_mods=True, notify=st.toast)
+                rollups = {name: snapshot_rollup(posts.attrs.get('snapshot'), posts) for name, posts in posts_by_name.items()}
+                people = rank_by_community(rollups, pull_most_valuable_people, **options)
+                st.write("Most valuable people in each community:")
+                for column, (name, ranked) in zip(st.columns(len(rollups)), people.groupby('Community', sort=False)):
+                    with column:
+                        st.caption(name)
+                        st.dataframe(ranked[['Author', 'Worth']].reset_index(drop=True))
+                st.write("Most valuable posts in each community:")
+                st.dataframe(rank_by_community(posts_by_name, pull_most_valuable_posts, **options))
+
+
 st.divider()
 """What I would like to eventually add: (depending on if circle ever gets back to us):
 - Events where we know the names of who hosted/cohosted (not available anywhere right now)
 - Filter by activity score (not available in headless)
-- Input tokens from multiple communities at a time to compare their data
 """
 
 
@@ -815,6 +743,7 @@ st.divider()
 
 # #PAGE TWO
 
+native_charts = st.toggle("Faster, interactive charts (not as pretty)", value=False)
 stats_button = st.button("Generate some statisitics/graphs about this data: ")
 if stats_button:
     if atoken == 0 or atoken == 1:
@@ -822,54 +751,56 @@ if stats_button:
     else:
 
         #about events
-        events = pull_all_events(atoken)
-        if len(events) > 0:
-            avg_attendees = round(events['Attendees'].mean())
-            max_attendees_row = events.loc[events['Attendees'].idxmax()]
-            biggest_event = max_attendees_row['Event_Title']
-            biggest_event_count = max_attendees_row['Attendees']
-
+        events = pull_event_stats(atoken, community)
+        if events['events'] > 0:
             st.subheader("Event Statistics:")
-            st.write(f"There have been {len(events)} livestream events.")
-            st.write(f"The average number of livestream attendees is {avg_attendees}.")
-            st.write(f"The event with the highest attendance was \"{biggest_event}\" with {biggest_event_count} attendees.")
+            st.write(f"There have been {events['events']} livestream events.")
+            st.write(f"The average number of livestream attendees is {events['avg_attendees']}.")
+            st.write(f"The event with the highest attendance was \"{events['biggest_event']}\" with {events['biggest_event_count']} attendees.")
 
             st.write("Here are the months and counts for when livestream events occurred.")
-            events['Date'] = pd.to_datetime(events['Date'])
-            events['YearMonth'] = events['Date'].dt.to_period('M')
-            events_per_month = events.groupby('YearMonth').size()
-            events_per_month_df = events_per_month.reset_index(name='Event_Count')
-            st.dataframe(events_per_month_df)
-            plot_events(events)
+            st.dataframe(events['per_month'])
+            show_chart('events', events['recent'], pull_all_events(atoken, community).attrs.get('snapshot'), native_charts)
             st.divider()
 
 
-        posts = pull_all_posts(atoken)
+        posts = pull_all_posts(atoken, community)
+        post_numbers = pull_post_stats(atoken, community)
+        snapshot = posts.attrs.get('snapshot')
         st.subheader("Post Statistics:")
-        post_counts = posts['Author'].value_counts()
-        highest_poster = post_counts.index[0]
-        most_posts_count = post_counts.iloc[0]
-        space_counts = posts['Space_Name'].value_counts()
-        biggest_space = space_counts.index[0]
-        biggest_space_count = space_counts.iloc[0]
-
-        st.write(f"The total number of posts made in this community is {len(posts)} posts.")
-        st.write(f"The person with the most posts is {highest_poster} with {most_posts_count} posts.")
-        st.write(f"The total number of community members with at least one post is {len(post_counts)} of our {member_count} total members, or about {round(len(post_counts)/member_count*100)}%.")
-        st.write(f"The space with the most posts is \"{biggest_space}\" with {biggest_space_count} posts, about {round(biggest_space_count/len(posts)*100)}% of all total posts.")
+        st.write(f"The total number of posts made in this community is {post_numbers['posts']} posts.")
+        st.write(f"The person with the most posts is {post_numbers['top_poster']} with {post_numbers['top_poster_posts']} posts.")
+        if member_count:
+            st.write(f"The total number of community members with at least one post is {post_numbers['posters']} of our {member_count} total members, or about {round(post_numbers['posters']/member_count*100)}%.")
+        else:  # the member count couldn't be read, the background refresh tries again
+            st.write(f"The total number of community members with at least one post is {post_numbers['posters']}.")
+        st.write(f"The space with the most posts is \"{post_numbers['biggest_space']}\" with {post_numbers['biggest_space_posts']} posts, about {round(post_numbers['biggest_space_posts']/post_numbers['posts']*100)}% of all total posts.")
         st.divider()
 
-        plot_post_type(posts)
+        show_chart('post_types', post_numbers['post_types'], snapshot, native_charts)
+        st.divider()
+        show_chart('posts_per_day', post_numbers['per_day'], snapshot, native_charts)
         st.divider()
-        plot_posts_per_day(posts)
+        show_chart('likes_comments_per_day', post_numbers['per_day'], snapshot, native_charts)
         st.divider()
-        plot_likes_comments_per_day(posts)
+        show_chart('space_likes', post_numbers['space_likes'], snapshot, native_charts)
         st.divider()
-        plot_top_5_likes(posts)
+        show_chart('space_comments', post_numbers['space_comments'], snapshot, native_charts)
         st.divider()
-        plot_top_5_comments(posts)
+
+        st.subheader("Top members of every 30 days:")
+        st.write("For the end of each month, the most valuable members over the 30 days before it.")
+        dates = pull_date_index(atoken, community, posts.attrs.get('snapshot'))
+        leaders = trailing_leaderboards(posts, default_weights, days=30, top_number=3, index=dates,
+                                        filter_admins=True, filter_mods=True)
+        st.dataframe(leaders.sort_values(['Month', 'Rank'], ascending=[False, True]), hide_index=True)
         
 
+# only for admins: set CIRCLE_DIAGNOSTICS=1 on the server, a visitor has no way to turn it on
+if os.environ.get('CIRCLE_DIAGNOSTICS'):
+    st.divider()
+    show_diagnostics()
+
         
 
 
@@ -0,0 +1,182 @@
+import csv
+import hashlib
+
+import pandas as pd
+
+from circle_api import (MAX_CONCURRENT_REQUESTS, REQUESTS_PER_SECOND, events_url, fetch_all_space_posts, request,
+                        spaces_url, stream_pages)
+from ingest import add_events, build_events_frame, build_frames, merge_authors, merge_events, merge_posts, page_columns
+from instrument import METRICS
+from store import PageCheckpoint, clear_checkpoint, load_frame, save_frame
+
+
+# Keeping a community's posts and events in sync with the API and the local store.
+# Nothing in here imports Streamlit: the app adds its caches and the background refresher
+# on top, the batch runs (batch.py) call it directly
+
+
+def community_key(first_token):
+    # short stable id for the community behind a headless token (so we never keep the token itself)
+    return hashlib.sha256(first_token.encode()).hexdigest()[:16]
+
+
+def parse_communities(lines, header=True):
+    # name,token,email rows (a CSV file or what was typed into the app) -> list of dicts,
+    # raises ValueError naming the rows that miss something
+    fields = None if header else ['name', 'token', 'email']
+    rows = [{(key or '').strip(): (value or '').strip() for key, value in row.items()}
+            for row in csv.DictReader(lines, fieldnames=fields, skipinitialspace=True)
+            if any((value or '').strip() for value in row.values() if isinstance(value, str))]
+    missing = [row.get('name') or f"row {i + 1}" for i, row in enumerate(rows)
+               if not (row.get('name') and row.get('token') and row.get('email'))]
+    if missing:
+        raise ValueError(f"name, token and email are needed for {', '.join(missing)}")
+    names = [row['name'] for row in rows]
+    if len(set(names)) != len(names):
+        raise ValueError("every community needs its own name")
+    return rows
+
+
+# get space IDs (maybe later have an option to display these??)
+@METRICS.timed('space_ids')
+def get_space_ids(access_token):
+    headers = {'Authorization': access_token}
+    response = request('GET', spaces_url(), headers=headers)
+    response.raise_for_status()
+    data = response.json()
+    df = pd.json_normalize(data)
+    return df[['id', 'name', 'space_type']]
+
+
+# Incremental sync settings: posts newer than REFRESH_WINDOW get their likes/comments re-pulled
+# every sync, everything older is only re-pulled by the full resync
+REFRESH_WINDOW = pd.Timedelta(days=7)
+FULL_RESYNC_AFTER = pd.Timedelta(days=7)
+# how old the stored posts/events can get before the API is used to top them up
+SYNC_INTERVAL = pd.Timedelta(hours=1)
+
+
+@METRICS.timed('sync_posts')
+def sync_posts(access_token, state=None, max_workers=MAX_CONCURRENT_REQUESTS, rate=REQUESTS_PER_SECOND, community=None,
+               progress=None, budget=None):
+    # state is the result of the last sync: {'posts', 'authors', 'cursors', 'full_sync', 'synced_at'}
+    # (None = pull everything)
+    # cursors hold the newest (created_at, Post_ID) seen in each space, posts come back newest first
+    # so a space stops paging once it gets past both its cursor and the refresh window
+    # with a community every finished page is checkpointed, so a failed sync picks up where it stopped
+    # progress(spaces_done, space_count, pages_done) is optional (the background refresh has no page to draw on)
+    # budget = a TokenBucket shared with the other communities of a multi-community pull
+    now = pd.Timestamp.now(tz='UTC')
+    if state is not None and now - state['full_sync'] > FULL_RESYNC_AFTER:
+        state = None
+    old_cursors = state['cursors'] if state is not None else {}
+    space_id_df = get_space_ids(access_token)
+    base = state['synced_at'].isoformat() if state is not None else None
+    checkpoint = PageCheckpoint(community, base) if community is not None else None
+
+    def stop_paging(space_id, records):
+        cursor = old_cursors.get(space_id)
+        if cursor is None:
+            return False
+        cutoff = min(cursor[0], now - REFRESH_WINDOW)
+        return pd.Timestamp(records[-1]['created_at']) <= cutoff
+
+    # all the spaces get paged at the same time, the shared rate limiter replaces the old sleep
+    pages_by_space = fetch_all_space_posts(access_token, space_id_df['id'], max_workers=max_workers,
+                                           rate=rate, handle_page=lambda space_id, records: page_columns(records),
+                                           stop_paging=stop_paging, checkpoint=checkpoint, progress=progress,
+                                           budget=budget)
+    # the first page of a space holds its newest post
+    new_cursors = {space_id: (pd.Timestamp(pages[0]['created_at'][0]), pages[0]['id'][0])
+                   for space_id, pages in pages_by_space.items() if pages}
+    # only the page columns are collected while paging, the typed frames are built once here
+    new_posts, new_authors = build_frames(page for pages in pages_by_space.values() for page in pages)
+    if state is None:
+        return {'posts': new_posts, 'authors': new_authors, 'cursors': new_cursors, 'full_sync': now, 'synced_at': now}
+    return {'posts': merge_posts(state['posts'], new_posts),
+            'authors': merge_authors(state['authors'], new_authors),
+            'cursors': {**old_cursors, **new_cursors},
+            'full_sync': state['full_sync'],
+            'synced_at': now}
+
+
+def save_post_state(community, state):
+    cursors = {str(space_id): [created_at.isoformat(), int(post_id)]
+               for space_id, (created_at, post_id) in state['cursors'].items()}
+    save_frame(community, 'posts', state['posts'], {
+        'cursors': cursors,
+        'full_sync': state['full_sync'].isoformat(),
+        'synced_at': state['synced_at'].isoformat()
+    })
+    save_frame(community, 'authors', state['authors'])
+
+
+def load_post_state(community):
+    posts, meta = load_frame(community, 'posts')
+    authors, _ = load_frame(community, 'authors')
+    if posts is None or authors is None:
+        return None
+    return {'posts': posts,
+            'authors': authors,
+            'cursors': {int(space_id): (pd.Timestamp(created_at), post_id)
+                        for space_id, (created_at, post_id) in meta['cursors'].items()},
+            'full_sync': pd.Timestamp(meta['full_sync']),
+            'synced_at': pd.Timestamp(meta['synced_at'])}
+
+
+def tag_snapshot(state, community):
+    posts = state['posts']
+    posts.attrs['snapshot'] = f"{community}@{state['synced_at'].isoformat()}"  # tells cached indexes which pull this is
+    return state
+
+
+def sync_and_save(access_token, community, state=None, progress=None, budget=None):
+    # one full sync step: pull, save, drop the checkpoint, returns the new (tagged) state
+    state = sync_posts(access_token, state, community=community, progress=progress, budget=budget)
+    if community is not None:
+        with METRICS.phase('save_posts'):
+            save_post_state(community, state)
+        clear_checkpoint(community)  # only once the finished sync is safely on disk
+    frame_size(state['posts'], 'posts', community)
+    return tag_snapshot(state, community)
+
+
+def stream_all_events(access_token, community=None, max_workers=MAX_CONCURRENT_REQUESTS, rate=REQUESTS_PER_SECOND,
+                      max_age=SYNC_INTERVAL, budget=None):
+    # Yields the events pulled so far after every page, so tables can fill in while later pages
+    # are still loading. Only yields once (the stored copy) when the store is younger than max_age
+    stored, meta = load_frame(community, 'events') if community is not None else (None, None)
+    now = pd.Timestamp.now(tz='UTC')
+    if stored is not None and now - pd.Timestamp(meta['synced_at']) < max_age:
+        stored.attrs['snapshot'] = f"{community}@{meta['synced_at']}"
+        yield stored
+        return
+    events = merge_events([stored] if stored is not None else [])  # keep the older events we already have
+    pulled = False
+    params = {'per_page': 100, 'past_events': 'True'}
+    for records in stream_pages(access_token, events_url(), params, max_workers=max_workers, rate=rate,
+                                budget=budget):
+        events = add_events(events, build_events_frame(records))  # one running merge, not all pages again
+        pulled = True
+        yield events
+    events.attrs['snapshot'] = f"{community}@{now.isoformat()}"  # only the complete frame gets one
+    if community is not None:
+        save_frame(community, 'events', events, {'synced_at': now.isoformat()})
+    if not pulled:
+        yield events
+
+
+@METRICS.timed('pull_events')
+def pull_events(access_token, community=None, max_age=SYNC_INTERVAL, budget=None):
+    # the complete events frame, without showing the pages as they come in
+    events = None
+    for events in stream_all_events(access_token, community, max_age=max_age, budget=budget):
+        pass
+    frame_size(events, 'events', community)
+    return events
+
+
+def frame_size(df, name, community=None):
+    # rows and bytes in memory of the latest frame of every community, for the diagnostics
+    METRICS.set(f"{name}_rows.{community}", len(df))
+    METRICS.set(f"{name}_bytes.{community}", int(df.memory_usage(deep=True).sum()))
@@ -0,0 +1,23 @@
+import pandas as pd
+
+from authors import AuthorIndex
+
+
+# A name picks people, by Author_ID: all of their rows go, also the ones under an older name
+
+def frame():
+    return pd.DataFrame({'Author': ['Sam Lee', 'Sam L.', 'Ann', 'Sam Lee', None, 'Bob'],
+                         'Author_ID': pd.array([1, 1, 2, 3, 4, None], dtype='Int64')})
+
+
+def test_a_name_selects_every_row_of_its_author_ids():
+    df = frame()
+    index = AuthorIndex(df)
+    assert index.author_ids(['sam lee']) == {1, 3}
+    assert index.select(df, [' Sam Lee ']).index.tolist() == [0, 1, 3]
+
+
+def test_exclude_keeps_everyone_else():
+    df = frame()
+    index = AuthorIndex(df)
+    assert index.select(df, ['sam l.', 'bob', 'nobody'], exclude=True).index.tolist() == [2, 3, 4]
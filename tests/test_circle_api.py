@@ -0,0 +1,90 @@
+import threading
+import time
+
+import pytest
+
+import circle_api
+from circle_api import MAX_RETRIES, STATS, TokenBucket, request, spaces_url
+from mock_api import ACCESS_TOKEN, MockServer
+from synthetic import SyntheticCommunity
+
+
+# The request/retry/rate limit code of circle_api against a local stand-in for the API
+# (benchmarks/mock_api.py), the 429s are forced with MockServer.throttle_requests
+
+HEADERS = {'Authorization': f"Bearer {ACCESS_TOKEN}"}
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = MockServer(SyntheticCommunity(200), retry_after=0.01)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(circle_api, 'BASE_URL', server.urls()['CIRCLE_API_URL'])
+    STATS.reset()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_retries_are_counted(server):
+    server.throttle_requests(2)
+    response = request('GET', spaces_url(), headers=HEADERS)
+    assert response.status_code == 200
+    assert len(response.json()) == 20
+    stats = STATS.snapshot()
+    assert (stats['requests'], stats['retries'], stats['throttled'], stats['failures']) == (3, 2, 2, 0)
+
+
+def test_retry_after_is_honoured(server):
+    server.retry_after = 0.3
+    server.throttle_requests(2)
+    start = time.perf_counter()
+    assert request('GET', spaces_url(), headers=HEADERS).status_code == 200
+    assert time.perf_counter() - start >= 0.6
+
+
+def test_gives_up_after_max_retries(server):
+    server.throttle_requests(100)
+    response = request('GET', spaces_url(), headers=HEADERS)
+    assert response.status_code == 429  # the last response comes back, the caller decides what to do
+    assert server.requests == MAX_RETRIES + 1
+    stats = STATS.snapshot()
+    assert (stats['requests'], stats['retries'], stats['failures']) == (MAX_RETRIES + 1, MAX_RETRIES, 1)
+
+
+def test_hold_keeps_the_longest_wait():
+    bucket = TokenBucket(rate=4)
+    threads = [threading.Thread(target=bucket.hold, args=(10,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert bucket.tokens == -40  # 10 seconds at 4 per second, not 8 times that
+    bucket.hold(2)
+    assert bucket.tokens == -40  # a shorter hold doesn't shorten a longer one
+
+
+def test_a_shared_bucket_waits_once_for_every_thread(server):
+    # 8 workers all get a 429 at the same time: together they wait one Retry-After, not 8 of them
+    server.retry_after = 0.5
+    server.latency = 0.1  # every first request is out before the first 429 comes back
+    server.throttle_requests(8)
+    bucket = TokenBucket(rate=100)
+    statuses = []
+    ready = threading.Barrier(8)
+
+    def worker():
+        ready.wait()
+        statuses.append(request('GET', spaces_url(), bucket=bucket, headers=HEADERS).status_code)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    assert statuses == [200] * 8
+    assert STATS.snapshot()['throttled'] == 8
+    assert 0.7 <= elapsed < 1.7  # 0.1 + 0.5 + 0.1, the old hold added every thread's 0.5s up: 4 seconds
@@ -0,0 +1,20 @@
+import numpy as np
+import pandas as pd
+
+from ingest import add_events, build_events_frame, merge_events
+from synthetic import SyntheticCommunity
+
+
+# The events stream adds page after page to one running frame, that has to end up the same as
+# merging all the pages at once (later pages win, like a refresh over the stored events)
+
+def test_adding_pages_matches_merging_them_all():
+    community = SyntheticCommunity(2000, n_events=250)
+    pages = [build_events_frame(records) for records in community.event_pages()]
+    rng = np.random.default_rng(0)
+    pages += [page.iloc[rng.permutation(len(page))[:10]] for page in pages[:2]]  # pages seen again
+    pages.append(pages[0].iloc[:0])
+    events = merge_events([])
+    for page in pages:
+        events = add_events(events, page)
+    pd.testing.assert_frame_equal(events, merge_events(pages))
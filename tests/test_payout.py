@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from valuation import allocate_cents, pull_most_valuable_people
+
+
+# Random property checks of the payout split: the cents always add up to the amount, nobody
+# gets a negative amount and nobody is a cent or more off their exact share
+
+TOTALS = [0, 1, 7, 99, 12_345, 10**9, 10**13]
+
+
+def random_shares(rng, kind, n):
+    if kind == 'uniform':
+        return rng.random(n) * 1000
+    if kind == 'ties':
+        return rng.integers(0, 5, n).astype(float)  # lots of ties and zeros
+    if kind == 'zeros':
+        return np.zeros(n)  # split evenly
+    return rng.pareto(1.2, n) * 100  # a few people worth most of it
+
+
+@pytest.mark.parametrize('kind', ['uniform', 'ties', 'zeros', 'skewed'])
+def test_allocate_cents_properties(kind):
+    rng = np.random.default_rng(sum(map(ord, kind)))
+    for trial in range(500):
+        n = int(rng.integers(1, 500))
+        shares = random_shares(rng, kind, n)
+        total = int(rng.choice(TOTALS))
+        cents = allocate_cents(shares, total)
+        exact = shares / shares.sum() * total if shares.sum() > 0 else np.full(n, total / n)
+        assert cents.dtype == np.int64 and len(cents) == n, trial
+        assert cents.sum() == total, f"trial {trial}: {cents.sum()} != {total}"
+        assert (cents >= 0).all(), f"trial {trial}: negative cents"
+        assert np.abs(cents - exact).max() < 1 + 1e-9 * total, f"trial {trial}: a cent or more off the exact share"
+
+
+def test_allocate_cents_is_deterministic_on_ties():
+    # equal shares: the leftover cents go to the first people, every time
+    assert allocate_cents(np.ones(3), 100).tolist() == [34, 33, 33]
+    assert allocate_cents(pd.Series([2.0, 1.0, 1.0]), 1).tolist() == [1, 0, 0]
+
+
+def test_payout_adds_up_in_the_people_table():
+    rollup = pd.DataFrame({
+        'Year_Month': [202401] * 4,
+        'Author_ID': pd.array([1, 2, 3, 3], dtype='Int64'),
+        'Author': ['Sam Lee', 'Sam Lee', 'Alex', 'Alex'],
+        'Post_Type': ['basic'] * 4,
+        'Space_Name': ['Space 1'] * 4,
+        'Role_Mask': np.zeros(4, dtype='uint8'),
+        'Posts': [1, 1, 1, 1],
+        'Likes': [3, 3, 1, 1],
+        'Comments': [0, 0, 0, 0],
+    })
+    weights = {'like': 1, 'comment': 2, 'basic': 1, 'image': 2}
+    people = pull_most_valuable_people(rollup, 3, weights, month=0, amount=100)
+    assert sorted(people['Author_ID']) == [1, 2, 3]  # two members called Sam Lee are two people
+    assert round(people['Rounded_Payment'].sum(), 2) == 100.0
@@ -0,0 +1,42 @@
+import time
+
+from refresher import Refresher
+
+
+# The background refresher: a community is refreshed while somebody keeps showing it and
+# dropped, credentials and all, once nobody has for idle_after seconds
+
+
+def make_refresher(idle_after):
+    refreshed = []
+    synced = {}
+
+    def refresh(community, credentials):
+        refreshed.append((community, credentials))
+        synced[community] = time.time()
+
+    refresher = Refresher(refresh, synced.get, interval=3600, check_every=3600, idle_after=idle_after)
+    refresher.run = lambda: None  # the tests drive refresh_due themselves
+    return refresher, refreshed
+
+
+def test_registered_communities_are_refreshed_once_when_due():
+    refresher, refreshed = make_refresher(idle_after=60)
+    refresher.register('a', ('token', 'a@example.com'))
+    refresher.refresh_due()
+    refresher.refresh_due()
+    assert refreshed == [('a', ('token', 'a@example.com'))]
+    assert refresher.status('a')['error'] is None
+
+
+def test_idle_communities_are_dropped():
+    refresher, refreshed = make_refresher(idle_after=60)
+    refresher.register('a', ('token', 'a@example.com'))
+    refresher.register('b', ('token', 'b@example.com'))
+    refresher.jobs['a']['seen_at'] -= 61  # nobody has shown 'a' for over a minute
+    refresher.refresh_due()
+    assert [community for community, _ in refreshed] == ['b']
+    assert not refresher.registered('a') and refresher.status('a') is None
+    refresher.register('a', ('token', 'a@example.com'))  # entering the token again brings it back
+    refresher.refresh_due()
+    assert [community for community, _ in refreshed] == ['b', 'a']
@@ -0,0 +1,67 @@
+import pandas as pd
+import pytest
+
+from authors import AuthorIndex
+from ingest import build_frames, page_columns
+from synthetic import SyntheticCommunity
+from valuation import (build_rollup, excluded_mask, pull_most_valuable_people, pull_most_valuable_posts, role_keep,
+                       sweep_people, sweep_posts, with_roles)
+
+
+# The rankings filter with masks over the shared frame instead of copying it, they have to pick
+# exactly what ranking a filtered copy picks
+
+WEIGHTS = {'like': 1, 'comment': 2, 'basic': 1, 'image': 2}
+
+
+@pytest.fixture(scope='module')
+def frames():
+    community = SyntheticCommunity(3000, seed=1)
+    posts, _ = build_frames(page_columns(records) for space_id in community.space_posts
+                            for records in community.space_pages(space_id))
+    return posts, build_rollup(posts)
+
+
+def excluded(df):
+    return ', '.join(df['Author'].value_counts().index[:5].astype(str))
+
+
+@pytest.mark.parametrize('filters', [{}, {'filter_admins': True}, {'filter_admins': True, 'filter_mods': True}])
+def test_people_ranking_with_masks(frames, filters):
+    _, rollup = frames
+    keep = excluded_mask(rollup, excluded(rollup))
+    latest = str(pd.to_datetime(frames[0]['Date']).max().date())
+    for month in (0, 3):
+        got = pull_most_valuable_people(rollup, 10, WEIGHTS, month=month, specific_date=latest, keep=keep, **filters)
+        roles = role_keep(rollup, **filters)
+        copy = rollup[keep & (True if roles is None else roles)]
+        expected = pull_most_valuable_people(copy, 10, WEIGHTS, month=month, specific_date=latest)
+        pd.testing.assert_frame_equal(got, expected)
+    sweep = sweep_people(rollup, [WEIGHTS], 10, keep=keep, **filters)
+    assert sweep['Author_ID'].tolist() == pull_most_valuable_people(rollup, 10, WEIGHTS, month=0, keep=keep,
+                                                                      **filters)['Author_ID'].tolist()
+
+
+@pytest.mark.parametrize('filters', [{}, {'filter_mods': True}])
+def test_posts_ranking_with_masks(frames, filters):
+    posts, _ = frames
+    keep = AuthorIndex(posts).keep([name.strip() for name in excluded(posts).split(',')])
+    dates = pd.to_datetime(posts['Date'])
+    date_range = (dates.quantile(0.4), dates.quantile(0.6))
+    got = pull_most_valuable_posts(posts, 10, WEIGHTS, date_range=date_range, keep=keep, **filters)
+    roles = role_keep(posts, **filters)
+    copy = posts[keep & (True if roles is None else roles)]
+    expected = pull_most_valuable_posts(copy, 10, WEIGHTS, date_range=date_range)
+    pd.testing.assert_frame_equal(got, expected)
+    sweep = sweep_posts(posts, [WEIGHTS], 10, date_range=date_range, keep=keep, **filters)
+    assert sweep['Post_ID'].tolist() == got['Post_ID'].tolist()
+
+
+def test_roles_come_from_the_authors_table_by_author_id():
+    people = pd.DataFrame({'Author': ['Sam Lee', 'Sam Lee', 'Ann'], 'Author_ID': pd.array([1, 2, 3], dtype='Int64'),
+                           'Worth': [3.0, 2.0, 1.0]})
+    authors = pd.DataFrame({'Author_ID': pd.array([2, 1], dtype='Int64'), 'Author': ['Sam Lee', 'Sam Lee'],
+                            'Author_Roles': [['moderator'], []], 'Role_Mask': [2, 0]})
+    people = with_roles(people, authors)
+    assert people.columns.tolist() == ['Author', 'Author_ID', 'Author_Roles', 'Worth']
+    assert people['Author_Roles'].tolist()[:2] == [[], ['moderator']] and pd.isna(people['Author_Roles'].iat[2])
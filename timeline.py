@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+
+NAT = np.iinfo('int64').min  # how NaT looks as int64, it sorts before every real date
+
+
+def as_utc(value):
+    # anything pd.Timestamp understands (a date from st.date_input, a string, a Timestamp) -> UTC Timestamp
+    value = pd.Timestamp(value)
+    return value.tz_localize('UTC') if value.tzinfo is None else value.tz_convert('UTC')
+
+
+def month_range(year_month):
+    # 202410 -> [2024-10-01, 2024-11-01) in UTC
+    start = pd.Timestamp(year=year_month // 100, month=year_month % 100, day=1, tz='UTC')
+    return start, start + pd.DateOffset(months=1)
+
+
+def trailing_range(days, now=None):
+    # the last `days` days up to now, open ended so nothing posted this very second is missed
+    now = as_utc(now if now is not None else pd.Timestamp.now(tz='UTC'))
+    return now - pd.Timedelta(days=days), None
+
+
+class DateIndex:
+    # Built once per frame: the Date column as a sorted int64 array plus the row position of
+    # every entry, so a [start, end) range is two binary searches and a slice of positions
+    # (O(log n) plus the rows returned) instead of comparing the whole column
+    def __init__(self, df, column='Date'):
+        self.length = len(df)
+        self.snapshot = df.attrs.get('snapshot')  # which pull of the data this index belongs to
+        keys = pd.DatetimeIndex(pd.to_datetime(df[column], utc=True)).as_unit('ns').asi8
+        if len(keys) and (keys[:-1] >= keys[1:]).all():  # newest first, the way sort_posts keeps the posts
+            self.order = np.arange(len(keys) - 1, -1, -1)
+        else:
+            self.order = np.argsort(keys, kind='stable')
+        self.keys = keys[self.order]
+        self.first = int(np.searchsorted(self.keys, NAT, side='right'))  # rows without a date are never in a range
+
+    def matches(self, df):
+        # True when df is the frame this index was built from (same pull, same rows)
+        return self.snapshot is not None and self.snapshot == df.attrs.get('snapshot') and self.length == len(df)
+
+    def bounds(self, starts, ends):
+        # vectorized: for arrays of starts/ends (None = open), the (lo, hi) slices of self.order
+        lo = np.maximum(self.first, np.searchsorted(self.keys, self.as_keys(starts, NAT), side='left'))
+        hi = np.searchsorted(self.keys, self.as_keys(ends, np.iinfo('int64').max), side='left')
+        return lo, np.maximum(lo, hi)
+
+    def as_keys(self, values, open_value):
+        values = np.atleast_1d(np.asarray(values, dtype=object))
+        return np.array([open_value if value is None else as_utc(value).as_unit('ns').value for value in values],
+                        dtype='int64')
+
+    def positions(self, start=None, end=None):
+        # row positions (oldest first) of every row with start <= Date < end
+        lo, hi = self.bounds(start, end)
+        return self.order[lo[0]:hi[0]]
+
+    def select(self, df, start=None, end=None):
+        # df must be the same frame (same row order) the index was built from, rows keep their order
+        return df.iloc[np.sort(self.positions(start, end))]
@@ -0,0 +1,503 @@
+import itertools
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+from authors import AuthorIndex
+from ingest import ADMIN_MASK, ROLE_MODERATOR
+from instrument import METRICS
+from timeline import DateIndex, month_range
+
+
+# Ranking posts, people and events. Nothing in here imports Streamlit, so the batch runs
+# (batch.py) use the exact same valuation as the app. Messages for the user go through
+# notify(message): the app passes st.toast, the batch prints them
+
+
+def ignore(message):
+    # the default notify, for callers that don't care about the messages
+    pass
+
+
+def rank_key(values):
+    # values (numbers or dates) -> (an array where bigger ranks higher, missing values) with the
+    # missing ones set to the lowest value there is, so they always come last
+    values = pd.Series(values) if not isinstance(values, pd.Series) else values
+    missing = values.isna().to_numpy()
+    if pd.api.types.is_datetime64_any_dtype(values):
+        key = pd.DatetimeIndex(values).as_unit('ns').asi8.copy()  # int64, floats would round the nanoseconds
+        key[missing] = np.iinfo('int64').min
+    else:
+        key = values.to_numpy(dtype='float64', na_value=np.nan, copy=True)  # never write into the frame
+        key[missing] = -np.inf
+    return key, missing
+
+
+def top_positions(values, n, tiebreak=None):
+    # Row positions of the n highest values, highest first, with equal values ordered by the
+    # tiebreak column (a Post_ID or Author_ID, lowest first) or else by row position. Partial
+    # selection instead of a full sort: argpartition finds the n-th highest value in O(rows),
+    # then only the rows at or above it get sorted. Only those n rows ever get copied out of
+    # the shared frame
+    key, missing = rank_key(values)
+    if n <= 0 or len(key) == 0:
+        return np.zeros(0, dtype='int64')
+    if n < len(key):
+        threshold = key[np.argpartition(key, len(key) - n)[len(key) - n]]
+        candidates = np.flatnonzero(key >= threshold)  # every tie with the n-th value, so the tiebreak decides
+    else:
+        candidates = np.arange(len(key))
+    if tiebreak is None:
+        tiebreak = candidates
+    else:
+        tiebreak = rank_key(pd.Series(tiebreak).iloc[candidates])[0]
+    descending = ~key[candidates] if key.dtype.kind == 'i' else -key[candidates]
+    order = np.lexsort((tiebreak, missing[candidates], descending))
+    return candidates[order[:n]]
+
+
+@METRICS.timed('valuation_events')
+def filter_events(df, weights, top_number=5):
+    worth = (df['Likes'] * weights['like']) + \
+        (df['Comments'] * weights['comment']) + \
+        (df['Attendees'] * weights['attendees']) + \
+        (df['Length_Minutes'] * weights['duration'])
+    top = top_positions(worth, top_number, tiebreak=df['Post_ID'])
+    top = df.iloc[top].assign(Worth=worth.to_numpy()[top]).reset_index(drop=True)
+    return top[['Event_Title', 'Worth', 'Attendees', 'Likes', 'Comments', 'Length_Minutes', 'Date', 'Author', 'Author_Roles']]
+
+
+ROLLUP_KEYS = ['Year_Month', 'Author_ID', 'Author', 'Post_Type', 'Space_Name', 'Role_Mask']
+
+
+@METRICS.timed('build_rollup')
+def build_rollup(posts):
+    # Monthly rollup cube: one row per (Year_Month, author, post type, space) holding the sums
+    # that Worth is made of. Worth is linear in them so ANY slider weights can be answered from
+    # the cube: Likes * like + Comments * comment + Posts * post type weight * 10
+    # Role_Mask is part of the key so the admin/mod filters still work per post
+    rollup = pd.DataFrame({
+        'Year_Month': posts['Date'].dt.year * 100 + posts['Date'].dt.month,  # e.g. 202410
+        'Author_ID': posts['Author_ID'],
+        'Author': posts['Author'],
+        'Post_Type': posts['Post_Type'],
+        'Space_Name': posts['Space_Name'],
+        'Role_Mask': posts['Role_Mask'],
+        'Likes': posts['Likes'],
+        'Comments': posts['Comments'],
+        'Posts': 1
+    })
+    rollup = rollup.groupby(ROLLUP_KEYS, observed=True, dropna=False, as_index=False, sort=False)[
+        ['Likes', 'Comments', 'Posts']].sum()
+    rollup.attrs = dict(posts.attrs)
+    return rollup
+
+
+def selected_year_month(month, specific_date='', notify=ignore):
+    # month: 0 = all time (None), 1 = this month, 2 = last month, 3 = the month of specific_date
+    now = datetime.now()
+    if month == 1:
+        return now.year * 100 + now.month
+    elif month == 2:
+        last_month_date = now - relativedelta(months=1)
+        return last_month_date.year * 100 + last_month_date.month
+    elif month == 3:
+        specific_date = datetime.strptime(str(specific_date), '%Y-%m-%d')
+        if specific_date > now and specific_date.month != now.month:
+            notify("Please choose a date in the PAST, not the future.")
+        return specific_date.year * 100 + specific_date.month
+    return None
+
+
+def to_cents(amount):
+    return int(round(float(amount) * 100))
+
+
+def allocate_cents(shares, total_cents):
+    # Largest remainder split of total_cents (an int) in proportion to shares, as int64 cents.
+    # Everybody gets the floor of their exact share and the cents left over go to the largest
+    # fractions (ties to the earlier row), all vectorized so it costs the same for 10 or 10
+    # million people and for any amount. The result always adds up to total_cents exactly and
+    # nobody is more than one cent off their exact share. All zero shares split evenly
+    shares = np.clip(np.asarray(shares, dtype='float64'), 0, None)
+    if len(shares) == 0:
+        return np.zeros(0, dtype='int64')
+    total = shares.sum()
+    if total <= 0:
+        shares = np.ones(len(shares))
+        total = float(len(shares))
+    exact = shares / total * total_cents
+    cents = np.floor(exact).astype('int64')
+    fraction = exact - cents
+    left = int(total_cents - cents.sum())  # 0 <= left < n, float rounding can push it a little outside
+    if left > 0:
+        order = np.argsort(-fraction, kind='stable')
+        cents[order[np.arange(left) % len(cents)]] += 1
+    elif left < 0:
+        order = np.argsort(fraction, kind='stable')
+        order = order[cents[order] > 0]
+        cents[order[:-left]] -= 1
+    return cents
+
+
+def role_bits(filter_admins=False, filter_mods=False):
+    # the Role_Mask bits made at ingest to drop (admins also covers 'admin' in the name)
+    return (ADMIN_MASK if filter_admins else 0) | (ROLE_MODERATOR if filter_mods else 0)
+
+
+def role_keep(df, filter_admins=False, filter_mods=False):
+    # mask of the rows the admin/mod filters keep, None when they keep every row
+    drop = role_bits(filter_admins, filter_mods)
+    if drop == 0:
+        return None
+    return (df['Role_Mask'].to_numpy() & drop) == 0
+
+
+def both(keep, more):
+    # the rows in both masks, None stands for every row
+    if keep is None:
+        return more
+    if more is None:
+        return keep
+    return keep & more
+
+
+def at(values, rows):
+    # a column at just the row positions (None = every row), the rest of the frame isn't copied
+    return values if rows is None else values.iloc[rows]
+
+
+def post_worth(df, weights, rows=None):
+    # Worth of every post (the posts leaderboard formula), or of just the posts at rows
+    type_weight = at(df['Post_Type'], rows).map(weights).astype(float)
+    return (at(df['Likes'], rows) * weights['like']) + (at(df['Comments'], rows) * weights['comment']) + (type_weight * 10)
+
+
+def rollup_rows(df, month=0, specific_date='', filter_admins=False, filter_mods=False, notify=ignore, keep=None):
+    # row positions of the rollup cube a people ranking is made of (None = every row), the
+    # filters are masks so the shared cube never gets copied. keep = a mask of the rows to
+    # consider at all (e.g. everybody but the excluded people)
+    keep = both(keep, role_keep(df, filter_admins, filter_mods))
+
+    #if 0, then for ALL TIME
+    year_month = selected_year_month(month, specific_date, notify)
+    if year_month is not None:
+        keep = both(keep, df['Year_Month'].to_numpy() == year_month)
+    # elif month == 4: for a different time range?
+    return None if keep is None else np.flatnonzero(keep)
+
+
+def post_rows(df, month=0, specific_date='', filter_admins=False, filter_mods=False, notify=ignore,
+              date_range=None, index=None, keep=None):
+    # row positions of the posts a posts ranking is made of (None = every post), in frame order
+    # date_range = (start, end) overrides month (None = open ended), index = the DateIndex of df
+
+    # one [start, end) range for every time option, cut out of the date sorted index by binary search
+    if date_range is None:
+        year_month = selected_year_month(month, specific_date, notify)
+        date_range = month_range(year_month) if year_month is not None else None
+    rows = None
+    if date_range is not None:
+        if index is None or not index.matches(df):
+            index = DateIndex(df)
+        rows = np.sort(index.positions(*date_range))
+
+    keep = both(keep, role_keep(df, filter_admins, filter_mods))
+    if keep is None:
+        return rows
+    return np.flatnonzero(keep) if rows is None else rows[keep[rows]]
+
+
+@METRICS.timed('valuation_people')
+def pull_most_valuable_people(df, top_number, weights, month=True, specific_date='',
+                              filter_admins=False, filter_mods=False, amount=0, notify=ignore, keep=None):
+    # df is the rollup cube from build_rollup (or a filtered piece of it), keep = an optional
+    # mask of its rows to rank (see rollup_rows)
+    rows = rollup_rows(df, month, specific_date, filter_admins, filter_mods, notify, keep)
+
+    type_weight = at(df['Post_Type'], rows).map(weights).astype(float)
+    worth = (at(df['Likes'], rows) * weights['like']) + \
+            (at(df['Comments'], rows) * weights['comment']) + \
+            (at(df['Posts'], rows) * type_weight * 10)
+
+    # grouped by Author_ID, two members can have the same display name (the name shown is the
+    # first one in the cube, the latest when the cube comes from newest first posts)
+    user_worth_df = pd.DataFrame({'Author_ID': at(df['Author_ID'], rows), 'Author': at(df['Author'], rows), 'Worth': worth})
+    user_worth_df = user_worth_df.groupby('Author_ID', sort=False).agg(Author=('Author', 'first'), Worth=('Worth', 'sum'))
+
+    #check HERE if there is enough people to return the full number
+    if len(user_worth_df) < top_number:
+        notify("There were not enough people who posted in this time period to fulfill your request. Please choose a different period or fewer people.")
+
+    top = top_positions(user_worth_df['Worth'], top_number, tiebreak=user_worth_df.index)
+    shortened = user_worth_df.iloc[top].reset_index()[['Author', 'Author_ID', 'Worth']]
+    total_worth = shortened['Worth'].sum()
+    shortened['Worth_Percentage'] = (shortened['Worth'] / total_worth * 100)
+
+    if amount != 0:
+        # the amount is split between the people shown, in whole cents that add up exactly
+        shortened['Rounded_Payment'] = allocate_cents(shortened['Worth'], to_cents(amount)) / 100
+        shortened.sort_values(by='Rounded_Payment', ascending=False, inplace=True, kind='stable')
+        shortened.reset_index(drop=True, inplace=True)
+
+    return shortened
+
+
+def with_roles(people, authors):
+    # a people table with everybody's current roles next to their Author_ID, from the authors
+    # table of the sync (one row per Author_ID), people without one get nothing
+    roles = people['Author_ID'].map(authors.set_index('Author_ID')['Author_Roles'])
+    people.insert(people.columns.get_loc('Author_ID') + 1, 'Author_Roles', roles.to_numpy())
+    return people
+
+
+@METRICS.timed('valuation_posts')
+def pull_most_valuable_posts(df, top_number, weights, month=0, specific_date='',
+                              filter_admins=False, filter_mods=False, notify=ignore,
+                              date_range=None, index=None, keep=None): #space_name="All",
+    # maybe add that you can filter by a specific SPACE ---> would need to SHOW the space names somewhere...
+    #like have a dropdown of all the space names...? might lead to more problems idk
+    # if month == 0: # do nothing
+    rows = post_rows(df, month, specific_date, filter_admins, filter_mods, notify, date_range, index, keep)
+    count = len(df) if rows is None else len(rows)
+
+        #after filtering to the right dates, now check how many posts there are --- if not enough, send a TOAST up and return early
+    #ACTUALLY THIS IS FOR THE POSTS, NOT THE PEOPLE PULLER
+    if count < top_number:
+        notify(f"There are only {count} posts from that time period. Please choose a different period or fewer posts.")
+
+    # df can be the shared cached frame, so nothing here writes to it and only the top rows get copied
+    worth = post_worth(df, weights, rows)
+
+    top = top_positions(worth, top_number, tiebreak=at(df['Post_ID'], rows))
+    shortened = df.iloc[top if rows is None else rows[top]].assign(Worth=worth.to_numpy()[top])
+    total_worth = shortened['Worth'].sum()
+    shortened['Worth_Percentage'] = (shortened['Worth'] / total_worth * 100)
+    shortened = shortened.reset_index(drop=True)
+    shortened['Date'] = pd.to_datetime(shortened['Date']).dt.strftime('%Y-%m-%d')
+    return shortened[['Title', 'Author', 'Worth', 'Worth_Percentage', 'Comments', 'Likes', 'Date', 'Post_ID']]
+
+    # month == 0 --> don't filter anything
+    # month == 1 --> filter to this current month so far
+    # month == 2 --> last month
+    # month == 3 --> the month of specific_date
+    # any other range --> date_range
+
+
+def named_people(df, excluded_list, index=None, notify=ignore):
+    # -> (the AuthorIndex of df, the names in the excluded_list string), with a notice about the
+    # names nobody goes by
+    # Split the excluded_list string into a list of names (handle spaces and remove empty names)
+    excluded_names = [name.strip().lower() for name in excluded_list.split(',') if name.strip()]
+
+    # the cached AuthorIndex of df does the lookups, only build one here if it doesn't fit df
+    if index is None or not index.matches(df):
+        index = AuthorIndex(df)
+
+    # Create an alert for invalid names, with a guess at who they meant
+    invalid_names = [name for name in excluded_names if name not in index]
+    if invalid_names:
+        hints = []
+        for name in invalid_names:
+            suggestions = index.suggest(name)
+            hints.append(f"{name} (did you mean {' or '.join(suggestions)}?)" if suggestions else name)
+        notify(f"Invalid name(s): {', '.join(hints)}")
+    return index, excluded_names
+
+
+def exclude_people(df, excluded_list, exclude=True, index=None, notify=ignore):
+    index, excluded_names = named_people(df, excluded_list, index, notify)
+    # Filter the DataFrame based on exclude flag (row positions from the index, no column scan)
+    return index.select(df, excluded_names, exclude=exclude)
+
+
+def excluded_mask(df, excluded_list, index=None, notify=ignore):
+    # the rows of everybody but the excluded people, as the keep= mask of the rankings, so the
+    # shared frame isn't copied just to leave a few people out
+    index, excluded_names = named_people(df, excluded_list, index, notify)
+    return index.keep(excluded_names)
+
+
+def compare_communities(posts, events=None):
+    # one row of headline numbers per Community, from the combined frames (ingest.combine_communities)
+    by_community = posts.groupby('Community', observed=False)
+    stats = by_community.agg(Posts=('Post_ID', 'size'), Posters=('Author_ID', 'nunique'),
+                             Likes=('Likes', 'sum'), Comments=('Comments', 'sum'),
+                             Spaces=('Space_Name', 'nunique'), Last_Post=('Date', 'max'))
+    stats['Likes_Per_Post'] = (stats['Likes'] / stats['Posts']).round(1)
+    stats['Comments_Per_Post'] = (stats['Comments'] / stats['Posts']).round(1)
+    space_counts = posts.groupby(['Community', 'Space_Name'], observed=True).size()
+    if len(space_counts):
+        stats['Biggest_Space'] = space_counts.groupby(level='Community', observed=False).idxmax().str[1]
+    stats['Top_Poster'] = posts.groupby('Community', observed=False)['Author'].agg(
+        lambda authors: authors.value_counts().index[0] if len(authors) else None)
+    if events is not None and len(events):
+        event_stats = events.groupby('Community', observed=False).agg(
+            Events=('Post_ID', 'size'), Avg_Attendees=('Attendees', 'mean'))
+        stats = stats.join(event_stats.round(1))
+    stats['Last_Post'] = stats['Last_Post'].dt.strftime('%Y-%m-%d')
+    return stats.reset_index()
+
+
+def rank_by_community(frames, rank, **options):
+    # {community name: frame} -> the rank(frame, **options) tables stacked with a Community
+    # column in front, every community is ranked on its own
+    ranked = [rank(frame, **options).assign(Community=name) for name, frame in frames.items()]
+    if not ranked:
+        return pd.DataFrame(columns=['Community'])
+    combined = pd.concat(ranked, ignore_index=True)
+    return combined[['Community'] + [column for column in combined.columns if column != 'Community']]
+
+
+def range_rollup(posts, date_range, index=None):
+    # the rollup cube of just the posts in [start, end), for people rankings over any range
+    if index is None or not index.matches(posts):
+        index = DateIndex(posts)
+    return build_rollup(index.select(posts, *date_range))
+
+
+@METRICS.timed('trailing_leaderboards')
+def trailing_leaderboards(posts, weights, days=30, top_number=5, index=None, filter_admins=False, filter_mods=False):
+    # For the end of every month, the top people over the `days` days before it. All the windows
+    # come out of one set of binary searches on the date index, every window then is one bincount
+    # over just its own posts
+    if index is None or not index.matches(posts):
+        index = DateIndex(posts)
+    if index.first == len(index.keys):
+        return pd.DataFrame(columns=['Month', 'Rank', 'Author', 'Author_ID', 'Worth'])
+    codes, author_ids = pd.factorize(posts['Author_ID'])  # by Author_ID like the people leaderboard, no ID = -1
+    has_id = np.flatnonzero(codes >= 0)
+    names = posts['Author'].to_numpy()[has_id[np.unique(codes[has_id], return_index=True)[1]]]  # first name of every ID
+    codes = codes[index.order]
+    worth = np.nan_to_num(post_worth(posts, weights).to_numpy(dtype='float64'))[index.order]
+    keep = (posts['Role_Mask'].to_numpy() & role_bits(filter_admins, filter_mods)) == 0
+    keep = keep[index.order] & (codes >= 0)
+
+    first = pd.Timestamp(index.keys[index.first], tz='UTC')
+    last = pd.Timestamp(index.keys[-1], tz='UTC')
+    ends = pd.date_range(first.normalize().replace(day=1) + pd.DateOffset(months=1),
+                         last.normalize().replace(day=1) + pd.DateOffset(months=1), freq='MS')
+    lo, hi = index.bounds(list(ends - pd.Timedelta(days=days)), list(ends))
+
+    rows = []
+    for end, start_at, stop_at in zip(ends, lo, hi):
+        window = slice(start_at, stop_at)
+        sums = np.bincount(codes[window][keep[window]], weights=worth[window][keep[window]], minlength=len(author_ids))
+        top = top_positions(sums, top_number, tiebreak=author_ids)
+        month = (end - pd.Timedelta(days=1)).strftime('%Y-%m')
+        rows.extend((month, rank + 1, names[code], author_ids[code], sums[code])
+                    for rank, code in enumerate(top) if sums[code] > 0)
+    return pd.DataFrame(rows, columns=['Month', 'Rank', 'Author', 'Author_ID', 'Worth'])
+
+
+# What-if weight sweeps: Worth is linear in the weights, so it is a feature matrix (one row per
+# post or author, one column per weight) times a weight matrix (one column per set of slider
+# values). Every weight set gets its Worth from ONE matrix product instead of a rerun each
+WEIGHT_KEYS = ['like', 'comment', 'basic', 'image']
+
+
+def weight_matrix(weight_sets):
+    # [{'like': 1, 'comment': 2, ...}, ...] -> (weights x sets) float array
+    return np.array([[float(weights[key]) for key in WEIGHT_KEYS] for weights in weight_sets]).T.reshape(len(WEIGHT_KEYS), -1)
+
+
+def weight_grid(base, spread=0.5, steps=3):
+    # every combination of each weight scaled between (1 - spread) and (1 + spread) of base, the
+    # base weights first. A weight of 0 stays 0
+    scales = np.linspace(1 - spread, 1 + spread, steps)
+    choices = [sorted({float(round(base[key] * scale, 6)) for scale in scales}) for key in WEIGHT_KEYS]
+    grid = [dict(zip(WEIGHT_KEYS, values)) for values in itertools.product(*choices)]
+    base = {key: float(base[key]) for key in WEIGHT_KEYS}
+    return [base] + [weights for weights in grid if weights != base]
+
+
+def post_features(df, rows=None):
+    # per post (at rows): Likes, Comments and 10 in the column of its post type. A post type
+    # without a weight gets NaN, the same as its Worth in pull_most_valuable_posts
+    post_type = at(df['Post_Type'], rows).astype(str).to_numpy()
+    features = np.zeros((len(post_type), len(WEIGHT_KEYS)))
+    features[:, 0] = at(df['Likes'], rows).to_numpy(dtype='float64')
+    features[:, 1] = at(df['Comments'], rows).to_numpy(dtype='float64')
+    for column, key in enumerate(WEIGHT_KEYS[2:], start=2):
+        features[:, column] = (post_type == key) * 10.0
+    features[~np.isin(post_type, WEIGHT_KEYS[2:])] = np.nan
+    return features
+
+
+def people_features(df, rows=None):
+    # per Author_ID, from the rollup cube (the rows at rows): the sums of the post features of
+    # all their posts. Rows of a post type without a weight add nothing, like in pull_most_valuable_people
+    post_type = at(df['Post_Type'], rows).astype(str).to_numpy()
+    known = np.isin(post_type, WEIGHT_KEYS[2:])
+    parts = pd.DataFrame({'Author_ID': at(df['Author_ID'], rows), 'Author': at(df['Author'], rows),
+                          'like': at(df['Likes'], rows).to_numpy() * known,
+                          'comment': at(df['Comments'], rows).to_numpy() * known})
+    for key in WEIGHT_KEYS[2:]:
+        parts[key] = (post_type == key) * at(df['Posts'], rows).to_numpy() * 10.0
+    grouped = parts.groupby('Author_ID', sort=False)
+    sums = grouped[WEIGHT_KEYS].sum()
+    return sums.to_numpy(dtype='float64'), sums.index, grouped['Author'].first().to_numpy()
+
+
+def sweep_rankings(features, ids, weight_sets, top_number):
+    # -> (Worth of every row for every weight set, the top_number row positions of every set)
+    worth = features @ weight_matrix(weight_sets)
+    tops = [top_positions(worth[:, column], top_number, tiebreak=ids) for column in range(worth.shape[1])]
+    return worth, tops
+
+
+def sweep_frame(weight_sets, worth, tops, labels):
+    # one row per (weight set, rank) with the weights it was ranked by
+    rows = []
+    for scenario, (weights, top) in enumerate(zip(weight_sets, tops)):
+        for rank, position in enumerate(top):
+            rows.append({'Scenario': scenario, **{key: weights[key] for key in WEIGHT_KEYS},
+                         'Rank': rank + 1, **{name: values[position] for name, values in labels.items()},
+                         'Worth': worth[position, scenario]})
+    return pd.DataFrame(rows, columns=['Scenario'] + WEIGHT_KEYS + ['Rank'] + list(labels) + ['Worth'])
+
+
+@METRICS.timed('sweep_people')
+def sweep_people(df, weight_sets, top_number, month=0, specific_date='', filter_admins=False, filter_mods=False,
+                 notify=ignore, keep=None):
+    # the people ranking of pull_most_valuable_people for every weight set at once
+    rows = rollup_rows(df, month, specific_date, filter_admins, filter_mods, notify, keep)
+    features, author_ids, names = people_features(df, rows)
+    worth, tops = sweep_rankings(features, author_ids.to_numpy(), weight_sets, top_number)
+    return sweep_frame(weight_sets, worth, tops, {'Author': names, 'Author_ID': author_ids.to_numpy()})
+
+
+@METRICS.timed('sweep_posts')
+def sweep_posts(df, weight_sets, top_number, month=0, specific_date='', filter_admins=False, filter_mods=False,
+                notify=ignore, date_range=None, index=None, keep=None):
+    # the posts ranking of pull_most_valuable_posts for every weight set at once
+    rows = post_rows(df, month, specific_date, filter_admins, filter_mods, notify, date_range, index, keep)
+    worth, tops = sweep_rankings(post_features(df, rows), at(df['Post_ID'], rows), weight_sets, top_number)
+    return sweep_frame(weight_sets, worth, tops, {'Title': at(df['Title'], rows).to_numpy(),
+                                                  'Author': at(df['Author'], rows).to_numpy(),
+                                                  'Post_ID': at(df['Post_ID'], rows).to_numpy()})
+
+
+def top_stability(sweep, key='Author_ID'):
+    # how stable the top is across the weight sets of a sweep: per member (or post) how often it
+    # made the top, its best and worst rank, and its rank with the base weights (scenario 0)
+    scenarios = sweep['Scenario'].nunique()
+    labels = [column for column in ['Title', 'Author'] if column in sweep and column != key]
+    stability = sweep.groupby(key, sort=False).agg(
+        **{label: (label, 'first') for label in labels},
+        In_Top=('Scenario', 'size'), Best_Rank=('Rank', 'min'), Worst_Rank=('Rank', 'max'))
+    stability['In_Top_Percentage'] = stability['In_Top'] / scenarios * 100
+    base = sweep[sweep['Scenario'] == 0].set_index(key)['Rank']
+    stability['Base_Rank'] = base.reindex(stability.index).astype('Int64')
+    return stability.reset_index().sort_values(['In_Top', 'Best_Rank'], ascending=[False, True], kind='stable',
+                                               ignore_index=True)
+
+
+def base_overlap(sweep, key='Author_ID'):
+    # per weight set, the share of the base top (scenario 0) that is still in its top
+    base = set(sweep.loc[sweep['Scenario'] == 0, key])
+    if not base:
+        return pd.Series(dtype='float64')
+    return sweep.groupby('Scenario')[key].agg(lambda ids: len(base & set(ids)) / len(base))